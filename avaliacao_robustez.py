@@ -1,33 +1,23 @@
-import pickle
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.metrics import confusion_matrix, classification_report
 from pathlib import Path
+from src.model.motor_inferencia import InferenceEngine
 
 def carregar_modelo():
     """Carrega o modelo treinado"""
-    with open('src/model/modelo_classificacao.pkl', 'rb') as f:
-        modelo, vectorizer = pickle.load(f)
-    return modelo, vectorizer
+    return InferenceEngine.carregar('src/model/modelo_classificacao.pkl')
 
-def classificar_texto(texto, modelo, vectorizer):
-    """Classifica um texto e retorna a prioridade e as probabilidades"""
-    texto_vec = vectorizer.transform([texto])
-    prioridade = modelo.predict(texto_vec)[0]
-    probabilidades = modelo.predict_proba(texto_vec)[0]
-    probs = {classe: float(prob) for classe, prob in zip(modelo.classes_, probabilidades)}
-    return prioridade, probs
-
-def avaliar_casos_teste(casos_teste, modelo, vectorizer):
+def avaliar_casos_teste(casos_teste, engine):
     """Avalia casos de teste definidos com rótulos esperados"""
     resultados = []
+    classificacoes = engine.classificar_lote([caso['texto'] for caso in casos_teste])
     
-    for caso in casos_teste:
+    for caso, (prioridade, probs) in zip(casos_teste, classificacoes):
         texto = caso['texto']
         esperado = caso['esperado']
         
-        prioridade, probs = classificar_texto(texto, modelo, vectorizer)
         acerto = prioridade == esperado
         
         resultados.append({
@@ -84,7 +74,7 @@ def main():
     print("=" * 70)
     
     # Carregar modelo
-    modelo, vectorizer = carregar_modelo()
+    engine = carregar_modelo()
     
     # Definir casos de teste com rótulos esperados
     casos_teste = [
@@ -138,7 +128,7 @@ def main():
     ]
     
     # Avaliar casos de teste
-    resultados = avaliar_casos_teste(casos_teste, modelo, vectorizer)
+    resultados = avaliar_casos_teste(casos_teste, engine)
     
     # Exibir resultados formatados
     print(f"\nResultados dos {len(resultados)} casos de teste:")
@@ -3,10 +3,13 @@
 Arquivo principal para iniciar o sistema de classificação de tickets.
 Este script serve como ponto de entrada central para toda a aplicação.
 """
+import time
+_INICIO = time.perf_counter()
+
 import os
 import sys
-import importlib.util
-import subprocess
+import importlib
+import runpy
 from pathlib import Path
 
 # Adicionar diretórios ao PATH
@@ -15,42 +18,54 @@ SRC_DIR = PROJECT_ROOT / "src"
 sys.path.insert(0, str(PROJECT_ROOT))
 sys.path.insert(0, str(SRC_DIR))
 
-def import_module_from_file(module_name, file_path):
-    """Importa um módulo Python a partir de um arquivo"""
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+def import_module(module_name):
+    """Importa apenas o módulo do projeto necessário para o comando (ex.: src.api.api)"""
+    module = importlib.import_module(module_name)
+    print(f"Módulo {module_name} carregado em {(time.perf_counter() - _INICIO) * 1000:.0f}ms")
     return module
 
+def run_module(module_name):
+    """Executa um módulo do projeto como `python -m`"""
+    runpy.run_module(module_name, run_name="__main__", alter_sys=True)
+
 def start_app():
     """Inicia a aplicação web"""
-    app_module = import_module_from_file("app_classificador", SRC_DIR / "interface" / "app_classificador.py")
+    app_module = import_module("src.interface.app_classificador")
     app_module.app.run(host='0.0.0.0', port=5000, debug=True)
 
 def start_api():
     """Inicia a API REST"""
-    api_module = import_module_from_file("api", SRC_DIR / "api" / "api.py")
+    api_module = import_module("src.api.api")
     api_module.app.run(host='0.0.0.0', port=5000, debug=True)
     
 def start_docker_api():
     """Inicia a API Docker"""
-    api_module = import_module_from_file("api_docker", SRC_DIR / "api" / "api_docker.py")
-    # O próprio módulo já inicia a API
+    api_module = import_module("src.api.api_docker")
+    api_module.main()
+
+def start_prefork_api():
+    """Inicia a API Docker em modo pre-fork (um processo por núcleo)"""
+    trabalhadores = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    api_module = import_module("src.api.api_docker")
+    api_module.main_prefork(trabalhadores)
 
 def train_model():
-    """Treina o modelo de classificação"""
-    model_module = import_module_from_file("treinar_modelo", SRC_DIR / "model" / "treinar_modelo.py")
-    # O próprio módulo já treina o modelo
+    """Treina o modelo de classificação (opções: --hashing, --n-features N, --sem-idf)"""
+    from src.model.treinar_modelo import main as treinar
+    treinar(sys.argv[2:])
 
 def generate_data():
     """Gera dados sintéticos para treinamento"""
-    data_module = import_module_from_file("gerador_dados_sinteticos", SRC_DIR / "model" / "gerador_dados_sinteticos.py")
-    # O próprio módulo já gera os dados
+    run_module("src.model.gerador_dados_sinteticos")
 
 def start_client():
     """Inicia o cliente de console"""
-    client_module = import_module_from_file("cliente_api", SRC_DIR / "interface" / "cliente_api.py")
-    # O próprio módulo já inicia o cliente
+    run_module("src.interface.cliente_api")
+
+def classify_file():
+    """Classifica um arquivo CSV/Parquet de tickets em vários processos"""
+    from src.model.classificar_arquivo import main as classificar_arquivo
+    classificar_arquivo(sys.argv[2:])
 
 def show_help():
     """Mostra a ajuda do sistema"""
@@ -63,9 +78,13 @@ Opções:
   app         Inicia a aplicação web
   api         Inicia a API REST
   docker-api  Inicia a API Docker na porta 7100
-  train       Treina o modelo
+  serve [N]   Inicia a API Docker com N processos pre-fork (padrão: núcleos)
+  train [--hashing] [--streaming]
+              Treina o modelo (--hashing: variante sem vocabulário)
   generate    Gera dados sintéticos
   client      Inicia o cliente console
+  classify-file ARQUIVO [-o SAIDA] [-p N]
+              Classifica um CSV/Parquet de tickets offline (retoma se interrompido)
   
   help        Mostra esta ajuda
 """)
@@ -84,12 +103,16 @@ def main():
         start_api()
     elif option == "docker-api":
         start_docker_api()
+    elif option == "serve":
+        start_prefork_api()
     elif option == "train":
         train_model()
     elif option == "generate":
         generate_data()
     elif option == "client":
         start_client()
+    elif option == "classify-file":
+        classify_file()
     elif option == "help":
         show_help()
     else:
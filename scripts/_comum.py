@@ -0,0 +1,40 @@
+"""
+Funções compartilhadas pelos scripts de benchmark.
+"""
+import os
+import random
+import subprocess
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(RAIZ, 'data', 'dataset_tickets_prioridade.csv')
+
+
+def carregar_textos(distribuicao, juntar=1):
+    """
+    Textos do dataset na distribuição de comprimento escolhida.
+
+    `curtos` e `longos` são o primeiro e o último quartil de comprimento; com
+    `juntar` > 1, cada ticket é a junção de `juntar` textos sorteados.
+    """
+    textos = pd.read_csv(DATASET)['texto'].astype(str)
+    comprimentos = textos.str.len()
+    if distribuicao == 'curtos':
+        textos = textos[comprimentos <= comprimentos.quantile(0.25)]
+    elif distribuicao == 'longos':
+        textos = textos[comprimentos >= comprimentos.quantile(0.75)]
+    textos = textos.tolist()
+    if juntar > 1:
+        sorteio = random.Random(0)
+        textos = ['. '.join(sorteio.choices(textos, k=juntar)) for _ in range(len(textos))]
+    return textos
+
+
+def commit_atual():
+    """Hash curto do commit em uso, ou None fora de um repositório git"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
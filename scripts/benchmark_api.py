@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+Benchmark de carga HTTP da API Docker.
+
+Sobe a API localmente (ou usa uma já em execução com --url) e dispara
+requisições a /api/v1/classificar e /api/v1/classificar-lote com várias
+threads, cada uma com a sua conexão persistente. Os textos são sorteados de
+data/dataset_tickets_prioridade.csv. Para cada cenário (endpoint,
+concorrência e tamanho de lote), mostra a vazão e as latências p50/p95/p99 e
+salva tudo em JSON. Com --comparar, aponta regressões em relação a uma
+execução anterior.
+
+A API é iniciada com o cache de predições desativado (use --cache para
+mantê-lo). As demais variáveis de ambiente (ADMISSAO_*, FAIXA_*, ...) são
+repassadas a ela.
+
+Uso:
+    python scripts/benchmark_api.py [-c 1,8,32] [-b 10,100,1000] [-d 10] [-o resultado.json]
+    python scripts/benchmark_api.py -o atual.json --comparar base.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from scripts._comum import carregar_textos, commit_atual  # noqa: E402
+
+ENDPOINTS = {
+    'classificar': '/api/v1/classificar',
+    'lote': '/api/v1/classificar-lote',
+}
+
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_api(porta, prefork=0, cache=False):
+    """Inicia a API em um subprocesso e espera /readyz; retorna (processo, url)"""
+    ambiente = dict(os.environ, PORT=str(porta), HOST='127.0.0.1')
+    ambiente.setdefault('LOG_NIVEL', 'WARNING')
+    ambiente.setdefault('LOG_LENTAS_MS', '0')
+    ambiente.setdefault('MODELO_VERIFICAR_SEGUNDOS', '0')
+    if not cache:
+        ambiente['CACHE_MAX_ITENS'] = '0'
+    if prefork:
+        comando = [sys.executable, 'main.py', 'serve', str(prefork)]
+    else:
+        comando = [sys.executable, '-m', 'src.api.api_docker']
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{porta}'
+    aguardar_prontidao(url, processo)
+    return processo, url
+
+
+def aguardar_prontidao(url, processo=None, prazo=120):
+    limite = time.monotonic() + prazo
+    espera = 0.1
+    while time.monotonic() < limite:
+        if processo is not None and processo.poll() is not None:
+            raise SystemExit(f"A API terminou durante a inicialização (código {processo.returncode})")
+        try:
+            if requests.get(url + '/readyz', timeout=2).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(espera)
+        espera = min(espera * 2, 2.0)
+    raise SystemExit(f"A API em {url} não ficou pronta em {prazo}s")
+
+
+def parar_api(processo):
+    processo.terminate()
+    try:
+        processo.wait(10)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+
+def executar_cenario(url, endpoint, concorrencia, tamanho_lote, textos, duracao, aquecimento):
+    """
+    Mantém `concorrencia` threads enviando requisições seguidas por `duracao` segundos.
+
+    As requisições que começam durante o `aquecimento` não entram nos resultados.
+    """
+    caminho = url + ENDPOINTS[endpoint]
+    inicio_medicao = time.monotonic() + aquecimento
+    fim = inicio_medicao + duracao
+    latencias = []
+    erros = Counter()
+    tickets = [0]
+    lock = threading.Lock()
+
+    def trabalhar(semente):
+        sorteio = random.Random(semente)
+        minhas_latencias = []
+        meus_erros = Counter()
+        meus_tickets = 0
+        with requests.Session() as sessao:
+            while True:
+                inicio = time.monotonic()
+                if inicio >= fim:
+                    break
+                if endpoint == 'classificar':
+                    dados, quantidade = {'texto': sorteio.choice(textos)}, 1
+                else:
+                    dados, quantidade = {'tickets': sorteio.choices(textos, k=tamanho_lote)}, tamanho_lote
+                try:
+                    resposta = sessao.post(caminho, json=dados, timeout=60)
+                    erro = None if resposta.status_code == 200 else str(resposta.status_code)
+                except requests.exceptions.RequestException as e:
+                    erro = type(e).__name__
+                if inicio < inicio_medicao:
+                    continue
+                if erro is None:
+                    minhas_latencias.append(time.monotonic() - inicio)
+                    meus_tickets += quantidade
+                else:
+                    meus_erros[erro] += 1
+        with lock:
+            latencias.extend(minhas_latencias)
+            erros.update(meus_erros)
+            tickets[0] += meus_tickets
+
+    threads = [threading.Thread(target=trabalhar, args=(semente,)) for semente in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencias_ms = np.array(latencias) * 1000
+    percentis = np.percentile(latencias_ms, [50, 95, 99]) if len(latencias_ms) else [None] * 3
+    return {
+        'endpoint': endpoint,
+        'concorrencia': concorrencia,
+        'tamanho_lote': tamanho_lote if endpoint == 'lote' else 1,
+        'duracao_s': duracao,
+        'requisicoes': len(latencias),
+        'erros': dict(erros),
+        'tickets': tickets[0],
+        'requisicoes_por_s': len(latencias) / duracao,
+        'tickets_por_s': tickets[0] / duracao,
+        'latencia_ms': {
+            'p50': _arredondar(percentis[0]),
+            'p95': _arredondar(percentis[1]),
+            'p99': _arredondar(percentis[2]),
+            'max': _arredondar(latencias_ms.max()) if len(latencias_ms) else None,
+        },
+    }
+
+
+def _arredondar(valor):
+    return None if valor is None else round(float(valor), 2)
+
+
+def chave_cenario(cenario):
+    return cenario['endpoint'], cenario['concorrencia'], cenario['tamanho_lote']
+
+
+def comparar(atual, base, tolerancia):
+    """Imprime a variação de cada cenário em relação a `base`; retorna o número de regressões"""
+    anteriores = {chave_cenario(cenario): cenario for cenario in base['cenarios']}
+    regressoes = 0
+    print(f"\nComparação com a execução de {base.get('data', '?')} (tolerância de {tolerancia:.0%}):")
+    for parametro in ('textos', 'juntar'):
+        if base['parametros'].get(parametro) != atual['parametros'][parametro]:
+            print(f"  Atenção: '{parametro}' difere da execução anterior "
+                  f"({base['parametros'].get(parametro)} -> {atual['parametros'][parametro]})")
+    for cenario in atual['cenarios']:
+        anterior = anteriores.get(chave_cenario(cenario))
+        if anterior is None or not anterior['tickets_por_s'] or not anterior['latencia_ms']['p99']:
+            continue
+        variacao_vazao = cenario['tickets_por_s'] / anterior['tickets_por_s'] - 1
+        variacao_p99 = (cenario['latencia_ms']['p99'] or float('inf')) / anterior['latencia_ms']['p99'] - 1
+        regrediu = variacao_vazao < -tolerancia or variacao_p99 > tolerancia
+        regressoes += regrediu
+        print(f"  {_descrever(cenario):<32} vazão {variacao_vazao:+7.1%}   p99 {variacao_p99:+7.1%}"
+              f"{'   <- REGRESSÃO' if regrediu else ''}")
+    return regressoes
+
+
+def _descrever(cenario):
+    lote = f" lote={cenario['tamanho_lote']}" if cenario['endpoint'] == 'lote' else ''
+    return f"{cenario['endpoint']} c={cenario['concorrencia']}{lote}"
+
+
+def imprimir(cenario):
+    latencia = cenario['latencia_ms']
+    erros = sum(cenario['erros'].values())
+    print(f"  {_descrever(cenario):<32} {cenario['requisicoes_por_s']:9.1f} req/s {cenario['tickets_por_s']:10.0f} tickets/s"
+          f"   p50 {latencia['p50']}ms  p95 {latencia['p95']}ms  p99 {latencia['p99']}ms"
+          f"{f'   erros: {erros}' if erros else ''}", flush=True)
+
+
+def _lista_inteiros(valor):
+    return [int(item) for item in valor.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga HTTP da API de classificação")
+    parser.add_argument('--url', help="API já em execução (padrão: inicia uma local)")
+    parser.add_argument('-e', '--endpoints', default='classificar,lote', help="classificar, lote ou ambos separados por vírgula")
+    parser.add_argument('-c', '--concorrencia', type=_lista_inteiros, default=[1, 8, 32], help="Threads clientes (lista)")
+    parser.add_argument('-b', '--tamanhos-lote', type=_lista_inteiros, default=[10, 100, 1000], help="Tickets por lote (lista)")
+    parser.add_argument('-t', '--textos', choices=('dataset', 'curtos', 'longos'), default='dataset',
+                        help="Distribuição de comprimento dos textos")
+    parser.add_argument('--juntar', type=int, default=1, help="Textos do dataset concatenados por ticket")
+    parser.add_argument('-d', '--duracao', type=float, default=10, help="Segundos medidos por cenário")
+    parser.add_argument('-a', '--aquecimento', type=float, default=2, help="Segundos descartados no início de cada cenário")
+    parser.add_argument('--prefork', type=int, default=0, help="Inicia a API em modo pre-fork com N trabalhadores")
+    parser.add_argument('--cache', action='store_true', help="Mantém o cache de predições da API ativo")
+    parser.add_argument('-o', '--saida', help="Arquivo JSON com os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="Variação aceita na comparação (padrão: 0.10)")
+    args = parser.parse_args(argv)
+
+    endpoints = [endpoint for endpoint in args.endpoints.split(',') if endpoint]
+    invalidos = set(endpoints) - set(ENDPOINTS)
+    if invalidos:
+        parser.error(f"Endpoints inválidos: {', '.join(sorted(invalidos))}")
+    textos = carregar_textos(args.textos, args.juntar)
+
+    processo = None
+    url = args.url.rstrip('/') if args.url else None
+    if url is None:
+        print("Iniciando a API local...", flush=True)
+        processo, url = iniciar_api(porta_livre(), args.prefork, args.cache)
+    try:
+        versao = requests.get(url + '/readyz', timeout=5).json().get('versao')
+        resultado = {
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ambiente': {
+                'python': platform.python_version(),
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+                'commit': commit_atual(),
+                'versao_modelo': versao,
+                'url': args.url,
+                'prefork': args.prefork,
+                'cache': None if args.url else args.cache,
+            },
+            'parametros': {
+                'textos': args.textos,
+                'juntar': args.juntar,
+                'comprimento_medio': round(float(np.mean([len(texto) for texto in textos])), 1),
+                'duracao_s': args.duracao,
+                'aquecimento_s': args.aquecimento,
+            },
+            'cenarios': [],
+        }
+        print(f"Textos: {args.textos} (comprimento médio {resultado['parametros']['comprimento_medio']} caracteres)")
+        for concorrencia in args.concorrencia:
+            for endpoint in endpoints:
+                for tamanho_lote in (args.tamanhos_lote if endpoint == 'lote' else [1]):
+                    cenario = executar_cenario(url, endpoint, concorrencia, tamanho_lote, textos,
+                                               args.duracao, args.aquecimento)
+                    resultado['cenarios'].append(cenario)
+                    imprimir(cenario)
+    finally:
+        if processo is not None:
+            parar_api(processo)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em '{args.saida}'")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark do caminho de inferência, sem HTTP.
+
+Mede, para lotes de 1 a 100 mil tickets curtos e longos (primeiro e último
+quartil de comprimento dos textos reais do dataset, para que os longos tenham
+a mesma distribuição de termos que a API recebe):
+- transform: `vectorizer.transform` do scikit-learn
+- predict_proba: `model.predict_proba` sobre a matriz já vetorizada
+- vetorizar / prever: as mesmas etapas no pontuador compilado
+- resultados: montagem de (prioridade, probabilidades) a partir da matriz
+- classificar_lote: o caminho completo do `InferenceEngine`
+- classificar_artefato: o mesmo caminho com o modelo carregado do artefato
+
+Também mede a carga do modelo (`pickle.load` e artefato mapeável). Cada
+etapa tem o menor tempo por chamada e o pico de memória alocada
+(tracemalloc). Os resultados vão para um JSON que serve de linha de base;
+com --comparar, o script termina com código 1 se alguma etapa ficar mais
+lenta ou usar mais memória que a tolerância.
+
+Uso:
+    python scripts/benchmark_inferencia.py -o base.json
+    python scripts/benchmark_inferencia.py -o atual.json --comparar base.json [--tolerancia 0.2]
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from scripts._comum import carregar_textos, commit_atual  # noqa: E402
+from src.utils.memoria import pico_memoria_residente  # noqa: E402
+from src.model.motor_inferencia import CAMINHOS_MODELO, InferenceEngine  # noqa: E402
+
+TAMANHOS = [1, 10, 100, 1000, 10000, 100000]
+# Diferenças abaixo destes valores são ruído de medição e nunca contam como regressão
+RUIDO_MS = 0.02
+RUIDO_MB = 1.0
+
+
+def cronometrar(funcao, tempo_min=0.5, repeticoes_min=3, repeticoes_max=1000):
+    """Menor tempo (ms) de `funcao`, repetida até somar `tempo_min` segundos (o menos afetado por interferências)"""
+    tempos = []
+    inicio = time.perf_counter()
+    while len(tempos) < repeticoes_max and (len(tempos) < repeticoes_min or time.perf_counter() - inicio < tempo_min):
+        antes = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - antes)
+    return min(tempos) * 1000
+
+
+def pico_memoria(funcao):
+    """Pico de memória alocada (MB) durante uma execução de `funcao`"""
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def montar_resultados(classes, probabilidades):
+    """Mesma montagem de (prioridade, probabilidades) feita por `InferenceEngine.classificar_lote`"""
+    resultados = []
+    for linha in probabilidades.tolist():
+        resultados.append((classes[linha.index(max(linha))], dict(zip(classes, linha))))
+    return resultados
+
+
+def medir(etapa, funcao, tamanho=None, tempo_min=0.5):
+    medicao = {'etapa': etapa, 'ms': round(cronometrar(funcao, tempo_min), 4), 'pico_mb': round(pico_memoria(funcao), 3)}
+    if tamanho:
+        medicao['us_por_ticket'] = round(medicao['ms'] * 1000 / tamanho, 3)
+    return medicao
+
+
+def _encontrar(pasta):
+    for caminho in CAMINHOS_MODELO:
+        if os.path.isdir(caminho) if pasta else (caminho.endswith('.pkl') and os.path.isfile(caminho)):
+            return caminho
+    return None
+
+
+def executar(caminho_pickle, caminho_artefato, tamanhos, distribuicoes, tempo_min=0.5):
+    resultado = {'carga': {}, 'medicoes': []}
+
+    def carregar_pickle():
+        with open(caminho_pickle, 'rb') as f:
+            return pickle.load(f)
+
+    resultado['carga']['pickle'] = medir('pickle', carregar_pickle, tempo_min=tempo_min)
+    engine_artefato = None
+    if caminho_artefato:
+        resultado['carga']['artefato'] = medir('artefato', lambda: InferenceEngine.carregar(caminho_artefato), tempo_min=tempo_min)
+        engine_artefato = InferenceEngine.carregar(caminho_artefato)
+
+    model, vectorizer = carregar_pickle()
+    engine = InferenceEngine(model, vectorizer, caminho=caminho_pickle)
+    classes = engine.classes
+
+    for distribuicao in distribuicoes:
+        base = carregar_textos(distribuicao)
+        for tamanho in tamanhos:
+            # Textos distintos (o sufixo numérico é um termo fora do vocabulário), para a deduplicação não interferir
+            textos = [f'{base[i % len(base)]} {i:06d}' for i in range(tamanho)]
+            matriz = vectorizer.transform(textos)
+            probabilidades = model.predict_proba(matriz)
+            etapas = [
+                ('transform', lambda: vectorizer.transform(textos)),
+                ('predict_proba', lambda: model.predict_proba(matriz)),
+            ]
+            if engine.pontuador is not None:
+                vetores = engine.pontuador.vetorizar(textos)
+                etapas += [
+                    ('vetorizar', lambda: engine.pontuador.vetorizar(textos)),
+                    ('prever', lambda: engine.pontuador.prever(vetores)),
+                ]
+            etapas += [
+                ('resultados', lambda: montar_resultados(classes, probabilidades)),
+                ('classificar_lote', lambda: engine.classificar_lote(textos)),
+            ]
+            if engine_artefato is not None:
+                etapas.append(('classificar_artefato', lambda: engine_artefato.classificar_lote(textos)))
+            for etapa, funcao in etapas:
+                medicao = dict(medir(etapa, funcao, tamanho, tempo_min), textos=distribuicao, tamanho=tamanho)
+                resultado['medicoes'].append(medicao)
+                print(f"  {distribuicao:<7} {tamanho:>7} {etapa:<17} {medicao['ms']:11.3f}ms "
+                      f"{medicao['us_por_ticket']:9.2f}µs/ticket {medicao['pico_mb']:9.2f}MB", flush=True)
+    return resultado
+
+
+def _chaves(resultado):
+    chaves = {('carga', nome): medicao for nome, medicao in resultado['carga'].items()}
+    chaves.update({(m['textos'], m['tamanho'], m['etapa']): m for m in resultado['medicoes']})
+    return chaves
+
+
+def comparar(atual, base, tolerancia):
+    """Imprime as regressões de tempo e memória em relação a `base`; retorna quantas foram encontradas"""
+    anteriores = _chaves(base)
+    regressoes = 0
+    print(f"\nComparação com a execução de {base.get('data', '?')} (tolerância de {tolerancia:.0%}):")
+    for chave, medicao in _chaves(atual).items():
+        anterior = anteriores.get(chave)
+        if anterior is None:
+            continue
+        problemas = []
+        if medicao['ms'] > anterior['ms'] * (1 + tolerancia) and medicao['ms'] - anterior['ms'] > RUIDO_MS:
+            problemas.append(f"tempo {anterior['ms']:.3f} -> {medicao['ms']:.3f}ms")
+        if (medicao['pico_mb'] > anterior['pico_mb'] * (1 + tolerancia)
+                and medicao['pico_mb'] - anterior['pico_mb'] > RUIDO_MB):
+            problemas.append(f"memória {anterior['pico_mb']:.2f} -> {medicao['pico_mb']:.2f}MB")
+        if problemas:
+            regressoes += 1
+            print(f"  REGRESSÃO {' '.join(map(str, chave))}: {'; '.join(problemas)}")
+    if not regressoes:
+        print("  Nenhuma regressão")
+    return regressoes
+
+
+def _lista_inteiros(valor):
+    return [int(item) for item in valor.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark do caminho de inferência")
+    parser.add_argument('-m', '--modelo', help="Pickle (model, vectorizer) (padrão: o encontrado)")
+    parser.add_argument('--artefato', help="Artefato mapeável para medir a carga (padrão: o encontrado)")
+    parser.add_argument('-b', '--tamanhos', type=_lista_inteiros, default=TAMANHOS, help="Tamanhos de lote (lista)")
+    parser.add_argument('-t', '--textos', default='curtos,longos', help="curtos, longos ou ambos separados por vírgula")
+    parser.add_argument('--tempo-min', type=float, default=0.5,
+                        help="Segundos de repetição por medição; mais tempo dá medições mais estáveis")
+    parser.add_argument('-o', '--saida', help="Arquivo JSON com os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior (linha de base)")
+    parser.add_argument('--tolerancia', type=float, default=0.20, help="Piora aceita na comparação (padrão: 0.20)")
+    args = parser.parse_args(argv)
+
+    caminho_pickle = args.modelo or _encontrar(pasta=False)
+    if caminho_pickle is None:
+        raise SystemExit("Modelo .pkl não encontrado. Execute 'python main.py train' ou informe -m.")
+    distribuicoes = [distribuicao for distribuicao in args.textos.split(',') if distribuicao]
+    if set(distribuicoes) - {'curtos', 'longos'}:
+        parser.error("Use --textos curtos, longos ou curtos,longos")
+
+    print(f"Modelo: {caminho_pickle}", flush=True)
+    resultado = {
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'commit': commit_atual(),
+            'modelo': caminho_pickle,
+        },
+    }
+    resultado.update(executar(caminho_pickle, args.artefato or _encontrar(pasta=True), args.tamanhos, distribuicoes,
+                              args.tempo_min))
+    pico = pico_memoria_residente()
+    resultado['ambiente']['rss_max_mb'] = round(pico / 2 ** 20, 1) if pico is not None else None
+    for nome, medicao in resultado['carga'].items():
+        print(f"  carga   {nome:<25} {medicao['ms']:11.3f}ms {medicao['pico_mb']:28.2f}MB")
+    print(f"  Pico de memória residente do processo: {resultado['ambiente']['rss_max_mb']}MB")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em '{args.saida}'")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,24 +8,31 @@ import os
 PORT = os.environ.get('PORT', '7100')
 API_URL = f"http://localhost:{PORT}"
 
-def check_health():
-    """Verifica se a API está funcionando corretamente"""
-    url = f"{API_URL}/api/v1/status"
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            print("✅ API está online!")
-            status_data = response.json()
-            print(f"Status: {status_data.get('status')}")
-            print(f"Modelo: {status_data.get('modelo')}")
-            print(f"Categorias: {', '.join(status_data.get('categorias', []))}")
-            return 0
-        else:
-            print(f"❌ API retornou status code: {response.status_code}")
+# Tempo máximo (s) esperando a API ficar pronta; abaixo do timeout do HEALTHCHECK do Docker
+PRAZO_PRONTIDAO = float(os.environ.get('HEALTHCHECK_PRAZO', 8))
+
+def wait_ready(prazo=PRAZO_PRONTIDAO):
+    """Consulta /readyz com espera exponencial até a API ficar pronta ou o prazo acabar"""
+    url = f"{API_URL}/readyz"
+    limite = time.monotonic() + prazo
+    espera = 0.25
+    while True:
+        try:
+            response = requests.get(url, timeout=2)
+            if response.status_code == 200:
+                print("✅ API está pronta!")
+                print(f"Versão do modelo: {response.json().get('versao')}")
+                return 0
+            motivo = response.json().get('motivo') if response.status_code == 503 else f"status code {response.status_code}"
+            print(f"⏳ API ainda não está pronta: {motivo}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"⏳ API ainda não responde: {e}")
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            print(f"❌ API não ficou pronta em {prazo:.0f} segundos")
             return 1
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Erro ao conectar à API: {e}")
-        return 1
+        time.sleep(min(espera, restante))
+        espera = min(espera * 2, 2.0)
 
 def test_classification():
     """Testa a classificação de um ticket"""
@@ -53,21 +60,10 @@ def test_classification():
 if __name__ == "__main__":
     print("Verificando saúde da API de Classificação...")
     
-    # Aguarda um tempo para a API inicializar
-    retries = 3
-    for i in range(retries):
-        health_status = check_health()
-        if health_status == 0:
-            break
-        else:
-            if i < retries - 1:
-                wait_time = (i + 1) * 5
-                print(f"Aguardando {wait_time} segundos antes de tentar novamente...")
-                time.sleep(wait_time)
-    
-    # Se a API está online, testa a classificação
+    # Só testa a classificação depois que a API aqueceu o modelo
+    health_status = wait_ready()
     if health_status == 0:
         classification_status = test_classification()
         sys.exit(classification_status)
     else:
-        sys.exit(health_status) 
\ No newline at end of file
+        sys.exit(health_status)
@@ -1,35 +1,20 @@
-import pickle
-import pandas as pd
-import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from src.api.cache_predicoes import CachePredicoes
+from src.model.motor_inferencia import InferenceEngine, encontrar_modelo
 
 # Carregar modelo
 print("Carregando modelo de classificação...")
 
-# Tentar vários caminhos possíveis para o modelo
-model_paths = [
-    'modelo_classificacao.pkl',  # Raiz atual
-    '/app/modelo_classificacao.pkl',  # Raiz do container
-    os.path.join(os.path.dirname(__file__), '..', 'model', 'modelo_classificacao.pkl')  # Caminho relativo
-]
-
-model = None
-vectorizer = None
+MODEL_PATH = encontrar_modelo()
+if MODEL_PATH is None:
+    raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
 
-for path in model_paths:
-    try:
-        print(f"Tentando carregar modelo de: {path}")
-        with open(path, 'rb') as f:
-            model, vectorizer = pickle.load(f)
-        print(f"✅ Modelo carregado com sucesso de: {path}")
-        break
-    except FileNotFoundError:
-        print(f"❌ Arquivo não encontrado: {path}")
-        continue
+engine = InferenceEngine.carregar(MODEL_PATH)
+print(f"✅ Modelo carregado com sucesso de: {MODEL_PATH}")
 
-if model is None:
-    raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
+# Cache de predições compartilhado pelos endpoints, invalidado quando o modelo muda
+cache = CachePredicoes.a_partir_do_ambiente(versao_modelo=engine.versao)
 
 app = Flask(__name__)
 CORS(app)  # Habilitar CORS para todas as rotas
@@ -48,13 +33,8 @@ def classificar_ticket():
     
     texto = request.json['texto']
     
-    # Classificar o texto
-    texto_vec = vectorizer.transform([texto])
-    prioridade = model.predict(texto_vec)[0]
-    probabilidades = model.predict_proba(texto_vec)[0]
-    
-    # Criar um dicionário de probabilidades
-    probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades)}
+    # Classificar o texto (consultando o cache antes do modelo)
+    prioridade, probs = cache.classificar([texto], engine.classificar_lote, chave_texto=engine.chave)[0]
     
     return jsonify({
         'ticket': texto,
@@ -80,19 +60,14 @@ def classificar_lote():
             'erro': 'O campo "tickets" deve ser uma lista de strings.'
         }), 400
     
-    # Classificar todos os tickets
-    textos_vec = vectorizer.transform(tickets)
-    prioridades = model.predict(textos_vec)
-    todas_probabilidades = model.predict_proba(textos_vec)
+    # Classificar todos os tickets (apenas os ausentes do cache passam pelo modelo)
+    classificacoes = cache.classificar(tickets, engine.classificar_lote, chave_texto=engine.chave)
     
     resultados = []
-    for i, ticket in enumerate(tickets):
-        # Criar um dicionário de probabilidades para este ticket
-        probs = {classe: float(prob) for classe, prob in zip(model.classes_, todas_probabilidades[i])}
-        
+    for ticket, (prioridade, probs) in zip(tickets, classificacoes):
         resultados.append({
             'ticket': ticket,
-            'prioridade': prioridades[i],
+            'prioridade': prioridade,
             'probabilidades': probs
         })
     
@@ -107,9 +82,14 @@ def status():
     return jsonify({
         'status': 'online',
         'modelo': 'Classificador de prioridade de tickets',
-        'categorias': model.classes_.tolist()
+        'categorias': engine.classes
     })
 
+@app.route('/api/v1/cache', methods=['GET'])
+def estatisticas_cache():
+    """Endpoint com os contadores do cache de predições"""
+    return jsonify(cache.estatisticas())
+
 # Documentação da API na página inicial
 @app.route('/', methods=['GET'])
 def documentacao():
@@ -168,6 +148,10 @@ def documentacao():
             <p><code>GET /api/v1/status</code></p>
             <p>Retorna o status atual da API e informações sobre o modelo.</p>
             
+            <h3>4. Estatísticas do Cache</h3>
+            <p><code>GET /api/v1/cache</code></p>
+            <p>Retorna acertos, falhas e remoções do cache de predições.</p>
+            
             <h2>Exemplo em cURL</h2>
             <pre>
             curl -X POST http://localhost:5000/api/v1/classificar \\
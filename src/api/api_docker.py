@@ -1,72 +1,200 @@
-import pickle
+import time
+_INICIO = time.perf_counter()
+
+import hmac
 import os
 import sys
 import logging
-import pandas as pd
-from flask import Flask, request, jsonify, render_template_string
+import shutil
+import signal
+import tempfile
+import threading
+import numpy as np
+from collections import Counter
+from flask import Flask, Response, g, request, jsonify, render_template_string
 from flask_cors import CORS
+from src.api.aprendizado_online import AprendizOnline, RegistroFeedback
+from src.api.cache_predicoes import CachePredicoes
+from src.api.controle_admissao import ControleAdmissao
+from src.api.faixas_prioridade import FaixasPrioridade
+from src.api.formato_compacto import FORMATOS, TIPO_BINARIO, codificar_binario, indices_prioridade, resposta_compacta
+from src.api.log_assincrono import amostrador, configurar_log_lentas, configurar_logging, sincronizar
+from src.api.metricas import LIMITES_LOTE, RegistroMetricas, memoria_residente
+from src.api.micro_lote import DespachanteMicroLote
+from src.api.recarga_modelo import GerenteModelo, aquecer
+from src.api.tarefas_lote import FilaTarefas, ler_csv
+from src.api.ndjson import em_blocos, ler_tickets, linha_json
+from src.model.motor_inferencia import CAMINHOS_MODELO, InferenceEngine, encontrar_modelo
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Configurar logging (escrito por uma thread separada, sem bloquear as requisições)
+configurar_logging(os.environ.get('LOG_NIVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+# Fração das requisições cujo texto e resultado são registrados no log
+deve_registrar_payload = amostrador(float(os.environ.get('LOG_AMOSTRA_PAYLOAD', 0.01)))
+
+# Requisições acima deste tempo vão para o log de requisições lentas (0 desativa)
+LIMITE_LENTAS_MS = float(os.environ.get('LOG_LENTAS_MS', 500))
+logger_lentas = configurar_log_lentas(__name__ + '.lentas', os.environ.get('LOG_LENTAS_ARQUIVO'))
+
 # Configurar a porta a partir da variável de ambiente ou usar 7100 como padrão
 PORT = int(os.environ.get('PORT', 7100))
 HOST = os.environ.get('HOST', '0.0.0.0')
 
+# Número de tickets classificados por vez no endpoint de streaming
+TAMANHO_BLOCO_STREAM = int(os.environ.get('TAMANHO_BLOCO_STREAM', 1000))
+
+# Treinar o modelo na inicialização quando ele não existe (desativado: deixa a subida lenta)
+TREINAR_SE_AUSENTE = os.environ.get('TREINAR_SE_AUSENTE', '0') == '1'
+
+# Intervalo para verificar se o modelo em disco mudou e recarregá-lo (0 desativa)
+MODELO_VERIFICAR_SEGUNDOS = float(os.environ.get('MODELO_VERIFICAR_SEGUNDOS', 10))
+
+# Token exigido pelos endpoints administrativos (sem ele, ficam desativados)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Lotes de até este tamanho com o cabeçalho "X-Prioridade: interativa" (os micro-lotes do
+# ClienteClassificador) são tratados como requisições interativas, e não como trabalho de lote
+LOTE_INTERATIVO_MAX = int(os.environ.get('LOTE_INTERATIVO_MAX', 100))
+
+# Máximo de itens por requisição de feedback
+FEEDBACK_MAX_ITENS = int(os.environ.get('FEEDBACK_MAX_ITENS', 100))
+
+# Pausa entre os blocos das tarefas assíncronas, cedendo CPU às requisições interativas
+TAREFAS_PAUSA_MS = float(os.environ.get('TAREFAS_PAUSA_MS', 5))
+
+# Definido por main_prefork: os trabalhadores são filhos de um mestre que recarrega o modelo
+MODO_PREFORK = False
+
+# Marcado quando o modelo foi aquecido; até lá /readyz responde 503 e o orquestrador não envia tráfego
+API_PRONTA = threading.Event()
+ERRO_AQUECIMENTO = None
+
+# Duração de cada etapa da inicialização, em milissegundos
+TEMPOS_INICIALIZACAO = {'importacoes': (time.perf_counter() - _INICIO) * 1000}
+
 logger.info(f"Iniciando API na porta {PORT} e host {HOST}")
 
-# Tentar vários caminhos possíveis para o modelo
-model_paths = [
-    'modelo_classificacao.pkl',  # Raiz atual
-    '/app/modelo_classificacao.pkl',  # Raiz do container
-    os.path.join(os.path.dirname(__file__), '..', 'model', 'modelo_classificacao.pkl')  # Caminho relativo
-]
-
-logger.info("Procurando modelo...")
-for path in model_paths:
-    logger.info(f"Verificando modelo em {path}...")
-    if os.path.exists(path):
-        MODEL_PATH = path
-        logger.info(f"✅ Modelo encontrado em: {MODEL_PATH}")
-        break
+_etapa = time.perf_counter()
+logger.info(f"Procurando modelo em: {', '.join(CAMINHOS_MODELO)}")
+MODEL_PATH = encontrar_modelo()
+if MODEL_PATH is not None:
+    logger.info(f"✅ Modelo encontrado em: {MODEL_PATH}")
+elif not TREINAR_SE_AUSENTE:
+    logger.error("❌ Modelo não encontrado em nenhum caminho conhecido. Execute 'python main.py train' "
+                 "antes de iniciar a API (ou defina TREINAR_SE_AUSENTE=1).")
+    raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
 else:
     logger.warning("❌ Modelo não encontrado em nenhum caminho conhecido.")
-    MODEL_PATH = 'modelo_classificacao.pkl'
+    import subprocess
     # Executar a geração de dados se necessário
     if not os.path.exists('dataset_tickets_prioridade.csv'):
         logger.info("Gerando dados sintéticos...")
-        import subprocess
         try:
-            subprocess.run(['python', '-m', 'src.model.gerador_dados_sinteticos'], check=True)
+            subprocess.run([sys.executable, '-m', 'src.model.gerador_dados_sinteticos'], check=True)
         except Exception as e:
             logger.error(f"Erro ao gerar dados: {e}")
     
     # Treinar o modelo
     logger.info("Treinando modelo...")
-    import subprocess
     try:
-        subprocess.run(['python', '-m', 'src.model.treinar_modelo'], check=True)
+        subprocess.run([sys.executable, '-m', 'src.model.treinar_modelo'], check=True)
     except Exception as e:
         logger.error(f"Erro ao treinar modelo: {e}")
+    MODEL_PATH = encontrar_modelo() or 'modelo_classificacao.pkl'
 
 # Carregar modelo
 logger.info(f"Carregando modelo de classificação de {MODEL_PATH}...")
 try:
-    with open(MODEL_PATH, 'rb') as f:
-        model, vectorizer = pickle.load(f)
+    engine = InferenceEngine.carregar(MODEL_PATH)
     logger.info("✅ Modelo carregado com sucesso!")
 except Exception as e:
     logger.error(f"❌ Erro ao carregar modelo: {e}")
     raise
+TEMPOS_INICIALIZACAO['modelo'] = (time.perf_counter() - _etapa) * 1000
+
+# Cache de predições compartilhado pelos endpoints, invalidado quando o modelo muda
+cache = CachePredicoes.a_partir_do_ambiente(versao_modelo=engine.versao)
+logger.info(f"Cache de predições: até {cache.max_itens} itens, TTL de {cache.ttl_segundos}s")
+
+# Motor em uso; substituído por inteiro quando o modelo é recarregado. Cada requisição
+# lê `gerente.engine` uma única vez e termina com o motor que obteve.
+gerente = GerenteModelo(engine, ao_trocar=[lambda novo: cache.atualizar_versao(novo.versao)])
+
+# Despachante opcional que agrupa requisições concorrentes de um único ticket
+despachante = DespachanteMicroLote.a_partir_do_ambiente()
+# Orçamento de tickets em processamento; acima dele as requisições esperam ou recebem 429
+controle_admissao = ControleAdmissao.a_partir_do_ambiente()
+if controle_admissao is not None:
+    logger.info(f"Controle de admissão: até {controle_admissao.capacidade} tickets em processamento, "
+                f"fila de até {controle_admissao.max_fila}")
+# Faixas de prioridade: tickets avulsos têm vagas próprias e o trabalho de lote é fatiado e cede a vez a eles
+faixas = FaixasPrioridade.a_partir_do_ambiente()
+if faixas is not None:
+    logger.info(f"Faixas de prioridade: {faixas.interativa.capacidade} vagas interativas, "
+                f"{faixas.trabalhadores_lote} de lote em fatias de {faixas.tamanho_fatia} tickets")
+
+# Fila em disco das tarefas assíncronas de classificação (processadas em segundo plano)
+tarefas = FilaTarefas.a_partir_do_ambiente()
+logger.info(f"Tarefas assíncronas em {tarefas.caminho} (blocos de {tarefas.tamanho_bloco} tickets)")
+
+# Correções de prioridade enviadas pelos atendentes, aplicadas ao modelo em segundo plano
+registro_feedback = RegistroFeedback.a_partir_do_ambiente()
+aprendiz = AprendizOnline.a_partir_do_ambiente(gerente, registro_feedback)
+
+if despachante is not None:
+    logger.info(f"Micro-lote ativado: janela de {despachante.janela * 1000:.1f}ms, até {despachante.max_lote} tickets")
 
 app = Flask(__name__)
 CORS(app)  # Habilitar CORS para todas as rotas
 
+# Métricas no formato do Prometheus, expostas em /metrics (por processo)
+metricas = RegistroMetricas()
+requisicoes_total = metricas.contador(
+    'classificador_requisicoes_total', 'Requisições atendidas por endpoint, método e status',
+    ('endpoint', 'metodo', 'status'))
+duracao_requisicao = metricas.histograma(
+    'classificador_requisicao_duracao_segundos', 'Duração das requisições até o envio dos cabeçalhos',
+    ('endpoint',))
+duracao_etapa = metricas.histograma(
+    'classificador_etapa_duracao_segundos', 'Duração de cada etapa (parse_json, vetorizar, prever, serializar)',
+    ('etapa',))
+tamanho_lote = metricas.histograma(
+    'classificador_tamanho_lote', 'Tickets por requisição de classificação', ('endpoint',), LIMITES_LOTE)
+predicoes_total = metricas.contador('classificador_predicoes_total', 'Predições por prioridade', ('prioridade',))
+metricas.medidor('classificador_cache_acertos_total', 'Acertos do cache de predições',
+                 lambda: cache.acertos, tipo='counter')
+metricas.medidor('classificador_cache_falhas_total', 'Falhas do cache de predições',
+                 lambda: cache.falhas, tipo='counter')
+metricas.medidor('classificador_cache_itens', 'Itens no cache de predições', lambda: cache.estatisticas()['itens'])
+if despachante is not None:
+    metricas.medidor('classificador_micro_lote_fila', 'Tickets aguardando o micro-lote',
+                     lambda: despachante.estatisticas()['fila'])
+if controle_admissao is not None:
+    metricas.medidor('classificador_admissao_em_uso', 'Tickets em processamento (orçamento ocupado)',
+                     lambda: controle_admissao.em_uso)
+    metricas.medidor('classificador_admissao_fila', 'Tickets aguardando admissão',
+                     lambda: controle_admissao.na_fila)
+    metricas.medidor('classificador_admissao_recusadas_total', 'Requisições recusadas com 429',
+                     lambda: controle_admissao.recusadas + controle_admissao.expiradas, tipo='counter')
+if faixas is not None:
+    metricas.medidor('classificador_faixa_interativa_em_uso', 'Requisições interativas em processamento',
+                     lambda: faixas.interativa.em_uso)
+    metricas.medidor('classificador_faixa_interativa_fila', 'Requisições interativas aguardando vaga',
+                     lambda: faixas.interativa.na_fila)
+    metricas.medidor('classificador_faixa_lote_fatias_total', 'Fatias processadas pela faixa de lote',
+                     lambda: faixas.fatias, tipo='counter')
+    metricas.medidor('classificador_faixa_lote_cessoes_total', 'Fatias de lote que cederam a vez a requisições interativas',
+                     lambda: faixas.cessoes, tipo='counter')
+metricas.medidor('process_resident_memory_bytes', 'Memória residente do processo em bytes', memoria_residente)
+
+# Tempo de vetorização e de predição medido pelo motor de inferência
+engine.observar_etapa = lambda etapa, segundos: duracao_etapa.observar(segundos, etapa)
+
+TEMPOS_INICIALIZACAO['total'] = (time.perf_counter() - _INICIO) * 1000
+logger.info("Inicialização concluída em %.0fms (importações: %.0fms, modelo: %.0fms)",
+            TEMPOS_INICIALIZACAO['total'], TEMPOS_INICIALIZACAO['importacoes'], TEMPOS_INICIALIZACAO['modelo'])
+
 # Template HTML para a documentação
 HTML = '''
 <!DOCTYPE html>
@@ -120,10 +248,81 @@ HTML = '''
     }
     </pre>
     
+    <p>Para lotes grandes, use <code>?formato=compacto</code> (JSON com as classes uma única vez,
+    os índices das prioridades e a matriz de probabilidades, sem ecoar os textos) ou
+    <code>?formato=binario</code> (matriz float32 seguida dos índices, com as classes no
+    cabeçalho <code>X-Classes</code>). <code>casas=N</code> arredonda as probabilidades do formato compacto.</p>
+    <pre>
+    {
+        "total": 2,
+        "classes": ["alto", "baixo", "medio"],
+        "prioridades": [0, 1],
+        "probabilidades": [[0.75, 0.05, 0.20], [0.10, 0.70, 0.20]]
+    }
+    </pre>
+    
     <h3>3. Verificar Status da API</h3>
     <p><code>GET /api/v1/status</code></p>
     <p>Retorna o status atual da API e informações sobre o modelo.</p>
     
+    <h3>4. Estatísticas do Cache</h3>
+    <p><code>GET /api/v1/cache</code></p>
+    <p>Retorna acertos, falhas e remoções do cache de predições.</p>
+    
+    <h3>5. Classificar em Streaming</h3>
+    <p><code>POST /api/v1/classificar-stream</code></p>
+    <p>Recebe um ticket por linha (NDJSON ou texto puro) e devolve uma linha NDJSON por ticket,
+    à medida que cada bloco é classificado. Use para grandes volumes.</p>
+    <pre>
+    curl -X POST http://localhost:7100/api/v1/classificar-stream \\
+        -H "Content-Type: application/x-ndjson" \\
+        --data-binary @tickets.ndjson
+    </pre>
+    
+    <h3>6. Métricas</h3>
+    <p><code>GET /metrics</code></p>
+    <p>Métricas no formato do Prometheus: requisições por endpoint e status, latência por etapa
+    (parse do JSON, vetorização, predição e serialização), tamanho dos lotes, predições por
+    prioridade e memória residente. No modo pre-fork, cada trabalhador expõe as suas.</p>
+    
+    <h3>7. Recarregar o Modelo</h3>
+    <p><code>POST /api/v1/admin/recarregar-modelo</code> (cabeçalho <code>X-Admin-Token</code>)</p>
+    <p>Carrega e aquece o modelo em disco e o troca pelo atual sem interromper requisições.
+    A API também verifica o modelo em disco periodicamente (<code>MODELO_VERIFICAR_SEGUNDOS</code>).</p>
+    
+    <h3>8. Vivacidade e Prontidão</h3>
+    <p><code>GET /livez</code> responde 200 enquanto o processo atende requisições.
+    <code>GET /readyz</code> responde 503 até o modelo ser aquecido na inicialização e 200 depois;
+    use-o para decidir quando enviar tráfego à instância.</p>
+    
+    <h3>9. Feedback de Prioridade</h3>
+    <p><code>POST /api/v1/feedback</code> registra a prioridade correta de um ticket (ou de vários, no campo
+    <code>feedbacks</code>, até <code>FEEDBACK_MAX_ITENS</code> por requisição) e responde <code>202</code>. Exige o cabeçalho
+    <code>X-Admin-Token</code>. Com o aprendizado online ativado (<code>FEEDBACK_INTERVALO_S</code>), o
+    feedback é aplicado ao modelo em segundo plano, sem retreinar.</p>
+    <pre>
+    {
+        "texto": "Botão de login está com cor errada",
+        "prioridade": "medio",
+        "prioridade_prevista": "baixo"
+    }
+    </pre>
+    
+    <h3>10. Tarefas Assíncronas</h3>
+    <p><code>POST /api/v1/tarefas</code> recebe um CSV (coluna <code>texto</code>) ou NDJSON e
+    responde <code>202</code> com o id da tarefa, processada em segundo plano.</p>
+    <p><code>GET /api/v1/tarefas/&lt;id&gt;</code> mostra o progresso,
+    <code>GET /api/v1/tarefas/&lt;id&gt;/resultados?inicio=0&amp;limite=1000</code> devolve os resultados
+    paginados e <code>DELETE /api/v1/tarefas/&lt;id&gt;</code> remove a tarefa.</p>
+    <pre>
+    curl -X POST http://localhost:7100/api/v1/tarefas \\
+        -H "Content-Type: text/csv" --data-binary @tickets.csv
+    </pre>
+    
+    <p>Sob sobrecarga, os endpoints de classificação respondem <code>429</code> com o cabeçalho
+    <code>Retry-After</code>; a ocupação da fila aparece em <code>/api/v1/status</code> e em <code>/metrics</code>.
+    Tickets avulsos têm vagas próprias e não esperam atrás dos lotes, que são processados em fatias.</p>
+    
     <h2>Exemplo em cURL</h2>
     <pre>
     curl -X POST http://localhost:7100/api/v1/classificar \\
@@ -147,9 +346,138 @@ HTML = '''
 </html>
 '''
 
+@app.before_request
+def iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def registrar_requisicao(resposta):
+    admissao = g.pop('admissao', None)
+    if admissao is not None:
+        # O orçamento só é devolvido quando a resposta termina de ser enviada (inclusive em streaming)
+        controle, custo = admissao
+        resposta.call_on_close(lambda: controle.liberar(custo))
+    endpoint = request.endpoint or 'desconhecido'
+    requisicoes_total.inc(endpoint, request.method, str(resposta.status_code))
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        duracao = time.perf_counter() - inicio
+        duracao_requisicao.observar(duracao, endpoint)
+        if LIMITE_LENTAS_MS > 0 and duracao * 1000 >= LIMITE_LENTAS_MS:
+            logger_lentas.warning("Requisição lenta: %s %s status=%d duracao=%.1fms tickets=%s",
+                                  request.method, request.path, resposta.status_code, duracao * 1000,
+                                  g.get('tickets_requisicao', '-'))
+    return resposta
+
+@app.teardown_request
+def liberar_admissao(erro=None):
+    # Só resta custo aqui se a resposta não chegou a ser montada
+    admissao = g.pop('admissao', None)
+    if admissao is not None:
+        controle, custo = admissao
+        controle.liberar(custo)
+
+def admitir(tickets, interativa=False):
+    """
+    Reserva o orçamento de admissão para a requisição atual; retorna False se ela deve ser recusada.
+
+    Com as faixas ativas, requisições interativas usam as vagas da faixa interativa
+    (uma por requisição) em vez do orçamento compartilhado com os lotes.
+    """
+    controle = controle_admissao
+    if interativa and faixas is not None:
+        controle, tickets = faixas.interativa, 1
+    if controle is None:
+        return True
+    custo = controle.adquirir(tickets)
+    if custo is None:
+        g.admissao_recusada = controle
+        return False
+    g.admissao = (controle, custo)
+    return True
+
+def resposta_sobrecarga():
+    """Resposta 429 rápida para quando a fila de admissão está cheia"""
+    logger.debug("Requisição recusada pelo controle de admissão")
+    controle = g.pop('admissao_recusada')
+    return jsonify({
+        'erro': 'Servidor sobrecarregado. Tente novamente em instantes.',
+        'fila_tickets': controle.na_fila
+    }), 429, {'Retry-After': str(controle.retry_after)}
+
+def classificar_em_lote(motor, textos):
+    """
+    `motor.classificar_lote` pela faixa de lote (em fatias), quando as faixas estão ativas.
+
+    Os textos repetidos são removidos antes do fatiamento, e não só dentro de cada fatia.
+    """
+    if faixas is None:
+        return motor.classificar_lote(textos)
+    unicos, inversos = motor.deduplicar(textos)
+    classificacoes = faixas.classificar_lote(motor.classificar_lote, unicos)
+    if inversos is None:
+        return classificacoes
+    return [classificacoes[indice] for indice in inversos]
+
+def ler_json():
+    """Decodifica o corpo JSON da requisição (None se inválido), medindo o tempo gasto"""
+    inicio = time.perf_counter()
+    dados = request.get_json(silent=True)
+    duracao_etapa.observar(time.perf_counter() - inicio, 'parse_json')
+    return dados
+
+def responder_json(dados):
+    """Serializa a resposta JSON, medindo o tempo gasto"""
+    inicio = time.perf_counter()
+    resposta = jsonify(dados)
+    duracao_etapa.observar(time.perf_counter() - inicio, 'serializar')
+    return resposta
+
+def registrar_predicoes(endpoint, classificacoes, contagens=None):
+    """
+    Atualiza o histograma de tamanho de lote e a contagem de predições por prioridade.
+
+    `contagens` ({prioridade: quantidade}) evita recontar quando já é conhecida.
+    """
+    tamanho_lote.observar(len(classificacoes), endpoint)
+    if endpoint != 'classificar_stream':
+        g.tickets_requisicao = len(classificacoes)
+    if contagens is None:
+        contagens = Counter(prioridade for prioridade, _ in classificacoes)
+    for prioridade, quantidade in contagens.items():
+        if quantidade:
+            predicoes_total.inc(prioridade, valor=quantidade)
+
+def responder_compacto(tickets, formato, casas=None, interativa=False):
+    """
+    Resposta do lote nos formatos compacto (JSON) ou binário (float32).
+
+    A matriz de probabilidades vem direto do modelo, sem passar pelo cache
+    nem montar um dicionário por ticket.
+    """
+    motor = gerente.engine
+    if not tickets:
+        probabilidades = np.empty((0, len(motor.classes)))
+    elif faixas is None or interativa:
+        probabilidades = motor.pontuar(tickets)
+    else:
+        unicos, inversos = motor.deduplicar(tickets)
+        probabilidades = np.vstack(faixas.executar_lote(motor.pontuar, unicos))
+        if inversos is not None:
+            probabilidades = probabilidades[np.asarray(inversos, dtype=np.intp)]
+    indices = indices_prioridade(probabilidades)
+    contagens = np.bincount(indices, minlength=len(motor.classes)).tolist()
+    registrar_predicoes('classificar_lote', indices, dict(zip(motor.classes, contagens)))
+    if formato == 'compacto':
+        return responder_json(resposta_compacta(motor.classes, probabilidades, casas))
+    inicio = time.perf_counter()
+    corpo, cabecalhos = codificar_binario(motor.classes, probabilidades)
+    duracao_etapa.observar(time.perf_counter() - inicio, 'serializar')
+    return Response(corpo, content_type=TIPO_BINARIO, headers=cabecalhos)
+
 @app.route('/')
 def documentacao():
-    logger.info("Acesso à documentação da API")
+    logger.debug("Acesso à documentação da API")
     return render_template_string(HTML)
 
 @app.route('/api/v1/classificar', methods=['POST'])
@@ -159,26 +487,38 @@ def classificar_ticket():
     Recebe um JSON com o campo 'texto' contendo a descrição do ticket
     Retorna a classificação de prioridade e as probabilidades de cada categoria
     """
-    logger.info("Recebida requisição para classificar ticket")
-    if not request.json or 'texto' not in request.json:
+    logger.debug("Recebida requisição para classificar ticket")
+    dados = ler_json()
+    if not isinstance(dados, dict) or 'texto' not in dados:
         logger.warning("Requisição inválida - texto não fornecido")
         return jsonify({
             'erro': 'Texto do ticket não fornecido. Envie um JSON com o campo "texto".'
         }), 400
     
-    texto = request.json['texto']
-    logger.info(f"Classificando texto: '{texto}'")
+    texto = dados['texto']
+    if not isinstance(texto, str):
+        logger.warning("Requisição inválida - texto não é uma string")
+        return jsonify({'erro': 'O campo "texto" deve ser uma string.'}), 400
+    if not admitir(1, interativa=True):
+        return resposta_sobrecarga()
+    registrar_payload = deve_registrar_payload()
+    if registrar_payload:
+        logger.info("Classificando texto: %r", texto)
     
-    # Classificar o texto
-    texto_vec = vectorizer.transform([texto])
-    prioridade = model.predict(texto_vec)[0]
-    probabilidades = model.predict_proba(texto_vec)[0]
+    # Classificar o texto (consultando o cache antes do modelo)
+    motor = gerente.engine
+    if despachante is not None:
+        # O motor vai junto com o texto: o resultado é o da versão usada na chave do cache
+        classificar = lambda textos: despachante.classificar(textos, motor.classificar_lote)
+    else:
+        classificar = motor.classificar_lote
+    classificacoes = cache.classificar([texto], classificar, motor.versao, motor.chave)
+    registrar_predicoes('classificar_ticket', classificacoes)
+    prioridade, probs = classificacoes[0]
+    if registrar_payload:
+        logger.info("Resultado: prioridade=%s, probabilidades=%s", prioridade, probs)
     
-    # Criar um dicionário de probabilidades
-    probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades)}
-    logger.info(f"Resultado: prioridade={prioridade}, probabilidades={probs}")
-    
-    return jsonify({
+    return responder_json({
         'ticket': texto,
         'prioridade': prioridade,
         'probabilidades': probs
@@ -191,60 +531,367 @@ def classificar_lote():
     Recebe um JSON com o campo 'tickets' contendo uma lista de descrições
     Retorna uma lista com as classificações de cada ticket
     """
-    logger.info("Recebida requisição para classificar lote de tickets")
-    if not request.json or 'tickets' not in request.json:
+    logger.debug("Recebida requisição para classificar lote de tickets")
+    dados = ler_json()
+    if not isinstance(dados, dict) or 'tickets' not in dados:
         logger.warning("Requisição inválida - tickets não fornecidos")
         return jsonify({
             'erro': 'Lista de tickets não fornecida. Envie um JSON com o campo "tickets".'
         }), 400
     
-    tickets = request.json['tickets']
+    tickets = dados['tickets']
     if not isinstance(tickets, list):
         logger.warning("Requisição inválida - tickets não é uma lista")
         return jsonify({
             'erro': 'O campo "tickets" deve ser uma lista de strings.'
         }), 400
     
-    logger.info(f"Classificando {len(tickets)} tickets")
+    formato = request.args.get('formato', 'completo')
+    if formato not in FORMATOS:
+        return jsonify({'erro': f'Formato inválido. Use um de: {", ".join(FORMATOS)}.'}), 400
+    interativa = (request.headers.get('X-Prioridade') == 'interativa'
+                  and len(tickets) <= LOTE_INTERATIVO_MAX)
+    if not admitir(len(tickets), interativa=interativa):
+        return resposta_sobrecarga()
     
-    # Classificar todos os tickets
-    textos_vec = vectorizer.transform(tickets)
-    prioridades = model.predict(textos_vec)
-    todas_probabilidades = model.predict_proba(textos_vec)
+    logger.debug("Classificando %d tickets (formato %s)", len(tickets), formato)
+    if formato != 'completo':
+        return responder_compacto(tickets, formato, request.args.get('casas', type=int), interativa)
+    
+    # Classificar todos os tickets (apenas os ausentes do cache passam pelo modelo)
+    motor = gerente.engine
+    if interativa:
+        classificar = motor.classificar_lote
+    else:
+        classificar = lambda textos: classificar_em_lote(motor, textos)
+    classificacoes = cache.classificar(tickets, classificar, motor.versao, motor.chave)
+    registrar_predicoes('classificar_lote', classificacoes)
     
     resultados = []
-    for i, ticket in enumerate(tickets):
-        # Criar um dicionário de probabilidades para este ticket
-        probs = {classe: float(prob) for classe, prob in zip(model.classes_, todas_probabilidades[i])}
-        
+    for ticket, (prioridade, probs) in zip(tickets, classificacoes):
         resultados.append({
             'ticket': ticket,
-            'prioridade': prioridades[i],
+            'prioridade': prioridade,
             'probabilidades': probs
         })
     
-    logger.info(f"Classificação concluída com sucesso para {len(tickets)} tickets")
-    return jsonify({
+    if deve_registrar_payload():
+        logger.info("Lote de %d tickets classificado; primeiro: %r -> %s",
+                    len(tickets), tickets[0] if tickets else None, resultados[0]['prioridade'] if resultados else None)
+    return responder_json({
         'total': len(resultados),
         'resultados': resultados
     })
 
+@app.route('/api/v1/classificar-stream', methods=['POST'])
+def classificar_stream():
+    """
+    Endpoint para classificar grandes volumes de tickets em streaming
+    Recebe um ticket por linha (NDJSON ou texto puro) no corpo da requisição
+    Retorna uma linha NDJSON por ticket, enviada à medida que cada bloco é classificado
+    """
+    tamanho_bloco = request.args.get('tamanho_bloco', TAMANHO_BLOCO_STREAM, type=int)
+    if tamanho_bloco <= 0:
+        return jsonify({'erro': 'O parâmetro "tamanho_bloco" deve ser positivo.'}), 400
+    
+    logger.debug("Recebida requisição de classificação em streaming (blocos de %d)", tamanho_bloco)
+    # Um bloco é classificado por vez: o stream ocupa o orçamento de um bloco até terminar
+    if not admitir(tamanho_bloco):
+        return resposta_sobrecarga()
+    
+    # O corpo é copiado para um arquivo temporário (em disco acima de 8MB) antes de responder:
+    # clientes que só leem a resposta depois de enviar tudo não travam com os buffers cheios
+    corpo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    shutil.copyfileobj(request.stream, corpo)
+    corpo.seek(0)
+    
+    # Todo o stream é classificado pela mesma versão do modelo
+    motor = gerente.engine
+    
+    def gerar():
+        total = 0
+        # Apenas um bloco fica em memória por vez. Não passa pelo cache
+        # para não expulsar os textos frequentes do tráfego interativo.
+        with corpo:
+            for bloco in em_blocos(ler_tickets(corpo), tamanho_bloco):
+                classificacoes = classificar_em_lote(motor, bloco)
+                registrar_predicoes('classificar_stream', classificacoes)
+                # Cada bloco é enviado em uma única escrita
+                inicio = time.perf_counter()
+                saida = ''.join(
+                    linha_json({
+                        'ticket': ticket,
+                        'prioridade': prioridade,
+                        'probabilidades': probs
+                    })
+                    for ticket, (prioridade, probs) in zip(bloco, classificacoes)
+                )
+                duracao_etapa.observar(time.perf_counter() - inicio, 'serializar')
+                yield saida
+                total += len(bloco)
+        logger.info("Classificação em streaming concluída para %d tickets", total)
+    
+    return Response(gerar(), mimetype='application/x-ndjson')
+
+@app.route('/api/v1/tarefas', methods=['POST'])
+def criar_tarefa():
+    """
+    Endpoint para submeter um arquivo grande para classificação assíncrona
+    Recebe um CSV (coluna "texto" ou a primeira) ou NDJSON, no corpo ou como campo "arquivo" (multipart)
+    Retorna o id da tarefa; o progresso e os resultados são consultados depois
+    """
+    arquivo = request.files.get('arquivo')
+    if arquivo is not None:
+        origem = arquivo.stream
+    else:
+        # Copiado antes da leitura linha a linha, que é lenta direto sobre o socket
+        origem = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        shutil.copyfileobj(request.stream, origem)
+        origem.seek(0)
+    nome = (arquivo.filename or '') if arquivo is not None else ''
+    tipo = arquivo.mimetype if arquivo is not None else request.mimetype
+    formato = request.args.get('formato') or ('csv' if tipo == 'text/csv' or nome.endswith('.csv') else 'ndjson')
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'erro': 'Formato inválido. Use "csv" ou "ndjson".'}), 400
+    
+    textos = ler_csv(origem, request.args.get('coluna')) if formato == 'csv' else ler_tickets(origem)
+    try:
+        tarefa_id = tarefas.criar(textos)
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning("Arquivo de tarefa inválido: %s", e)
+        return jsonify({'erro': f'Arquivo inválido: {e}'}), 400
+    finally:
+        origem.close()
+    
+    tarefa = tarefas.obter(tarefa_id)
+    logger.info("Tarefa %s criada com %d tickets", tarefa_id, tarefa['total'])
+    resposta = jsonify(dict(tarefa, status_url=f'/api/v1/tarefas/{tarefa_id}',
+                            resultados_url=f'/api/v1/tarefas/{tarefa_id}/resultados'))
+    return resposta, 202
+
+@app.route('/api/v1/tarefas/<tarefa_id>', methods=['GET'])
+def status_tarefa(tarefa_id):
+    """Endpoint com o estado e o progresso de uma tarefa"""
+    tarefa = tarefas.obter(tarefa_id)
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada.'}), 404
+    return jsonify(tarefa)
+
+@app.route('/api/v1/tarefas/<tarefa_id>/resultados', methods=['GET'])
+def resultados_tarefa(tarefa_id):
+    """
+    Endpoint com os resultados de uma tarefa, paginados
+    Parâmetros: inicio (índice do primeiro ticket) e limite (até 10000)
+    Retorna os resultados já calculados e o "proximo" início, se houver mais
+    """
+    tarefa = tarefas.obter(tarefa_id)
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada.'}), 404
+    inicio = request.args.get('inicio', 0, type=int)
+    limite = request.args.get('limite', 1000, type=int)
+    if inicio < 0 or not 0 < limite <= 10000:
+        return jsonify({'erro': 'Use inicio >= 0 e limite entre 1 e 10000.'}), 400
+    
+    resultados = tarefas.resultados(tarefa_id, inicio, limite)
+    fim = inicio + len(resultados)
+    return responder_json({
+        'id': tarefa_id,
+        'estado': tarefa['estado'],
+        'total': tarefa['total'],
+        'inicio': inicio,
+        'resultados': resultados,
+        'proximo': fim if fim < tarefa['total'] and len(resultados) == limite else None
+    })
+
+@app.route('/api/v1/tarefas/<tarefa_id>', methods=['DELETE'])
+def remover_tarefa(tarefa_id):
+    """Endpoint para cancelar uma tarefa e apagar seus resultados"""
+    if not tarefas.remover(tarefa_id):
+        return jsonify({'erro': 'Tarefa não encontrada.'}), 404
+    logger.info("Tarefa %s removida", tarefa_id)
+    return jsonify({'id': tarefa_id, 'removida': True})
+
+def verificar_admin(aviso):
+    """Retorna a resposta 403 quando o X-Admin-Token não confere com ADMIN_TOKEN (ou ele não foi definido)"""
+    if not ADMIN_TOKEN:
+        return jsonify({'erro': 'Endpoint desativado. Defina ADMIN_TOKEN para habilitá-lo.'}), 403
+    # Comparação em tempo constante, para não revelar o token pelo tempo de resposta
+    recebido = request.headers.get('X-Admin-Token', '').encode('utf-8')
+    if not hmac.compare_digest(recebido, ADMIN_TOKEN.encode('utf-8')):
+        logger.warning(aviso)
+        return jsonify({'erro': 'Token administrativo inválido.'}), 403
+    return None
+
+@app.route('/api/v1/feedback', methods=['POST'])
+def registrar_feedback():
+    """
+    Endpoint para informar a prioridade correta de tickets
+    Recebe um JSON com "texto" e "prioridade" (e opcionalmente "prioridade_prevista"),
+    ou com o campo "feedbacks" contendo uma lista desses objetos
+    Exige o cabeçalho X-Admin-Token igual à variável ADMIN_TOKEN
+    O feedback é gravado e aplicado ao modelo em segundo plano pelo aprendizado online
+    """
+    negado = verificar_admin("Feedback enviado com token inválido")
+    if negado is not None:
+        return negado
+    dados = ler_json()
+    itens = dados.get('feedbacks', [dados]) if isinstance(dados, dict) else None
+    if not isinstance(itens, list) or not itens:
+        return jsonify({
+            'erro': 'Envie um JSON com "texto" e "prioridade", ou com "feedbacks" contendo uma lista deles.'
+        }), 400
+    if len(itens) > FEEDBACK_MAX_ITENS:
+        return jsonify({'erro': f'Envie no máximo {FEEDBACK_MAX_ITENS} itens de feedback por requisição.'}), 413
+    
+    motor = gerente.engine
+    registros = []
+    for posicao, item in enumerate(itens):
+        if not isinstance(item, dict) or not isinstance(item.get('texto'), str) or not item['texto'].strip():
+            return jsonify({'erro': f'Item {posicao}: o campo "texto" deve ser uma string não vazia.'}), 400
+        if item.get('prioridade') not in motor.classes:
+            return jsonify({
+                'erro': f'Item {posicao}: prioridade inválida. Use uma de: {", ".join(motor.classes)}.'
+            }), 400
+        registros.append((item['texto'], item['prioridade'], item.get('prioridade_prevista')))
+    
+    ids = registro_feedback.registrar(registros, motor.versao)
+    logger.info("%d itens de feedback registrados (ids %d a %d)", len(ids), ids[0], ids[-1])
+    return jsonify({
+        'registrados': len(ids),
+        'ids': ids,
+        'aprendizado_online': aprendiz is not None,
+        'intervalo_s': aprendiz.intervalo if aprendiz is not None else None
+    }), 202
+
 @app.route('/api/v1/status', methods=['GET'])
 def status():
     """Endpoint para verificar se a API está funcionando"""
-    logger.info("Verificação de status solicitada")
+    logger.debug("Verificação de status solicitada")
     return jsonify({
         'status': 'online',
         'modelo': 'Classificador de prioridade de tickets',
-        'categorias': model.classes_.tolist(),
+        'categorias': gerente.engine.classes,
         'porta': PORT,
-        'host': HOST
+        'host': HOST,
+        'processo': os.getpid(),
+        'inicializacao_ms': TEMPOS_INICIALIZACAO,
+        'micro_lote': despachante.estatisticas() if despachante is not None else None,
+        'modelo_carregado': gerente.estatisticas(),
+        'tarefas': tarefas.contagem_por_estado(),
+        'admissao': controle_admissao.estatisticas() if controle_admissao is not None else None,
+        'faixas': faixas.estatisticas() if faixas is not None else None,
+        'aprendizado_online': aprendiz.estatisticas() if aprendiz is not None else None
     })
 
+@app.route('/livez', methods=['GET'])
+def vivacidade():
+    """Endpoint de vivacidade: não consulta o modelo nem o disco"""
+    return jsonify({'status': 'vivo'})
+
+@app.route('/readyz', methods=['GET'])
+def prontidao():
+    """Endpoint de prontidão: 200 só depois que o modelo em uso foi aquecido"""
+    if not API_PRONTA.is_set():
+        return jsonify({
+            'pronta': False,
+            'motivo': f'Falha no aquecimento: {ERRO_AQUECIMENTO}' if ERRO_AQUECIMENTO else 'Aquecendo o modelo'
+        }), 503
+    return jsonify({'pronta': True, 'versao': gerente.engine.versao})
+
+@app.route('/api/v1/cache', methods=['GET'])
+def estatisticas_cache():
+    """Endpoint com os contadores do cache de predições"""
+    logger.debug("Estatísticas do cache solicitadas")
+    return jsonify(cache.estatisticas())
+
+@app.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    """Endpoint com as métricas do processo no formato de texto do Prometheus"""
+    return Response(metricas.renderizar(), content_type=metricas.TIPO_CONTEUDO)
+
+@app.route('/api/v1/admin/recarregar-modelo', methods=['POST'])
+def recarregar_modelo():
+    """
+    Endpoint administrativo para recarregar o modelo sem reiniciar a API
+    Exige o cabeçalho X-Admin-Token igual à variável ADMIN_TOKEN
+    O novo modelo é carregado e aquecido enquanto as requisições continuam no atual
+    """
+    negado = verificar_admin("Tentativa de recarga do modelo com token inválido")
+    if negado is not None:
+        return negado
+    if MODO_PREFORK:
+        # No pre-fork, o mestre recarrega o modelo e troca todos os trabalhadores
+        os.kill(os.getppid(), signal.SIGHUP)
+        return jsonify({'reinicio_solicitado': True, 'versao': gerente.engine.versao}), 202
+    try:
+        resultado = gerente.recarregar()
+    except Exception as e:
+        logger.error("❌ Erro ao recarregar modelo: %s", e)
+        return jsonify({'erro': f'Falha ao recarregar o modelo: {e}', 'versao': gerente.engine.versao}), 500
+    return jsonify(resultado)
+
+def aquecer_inicializacao():
+    """
+    Aquece o modelo em uso (caminhos de um texto, de lote e do scikit-learn) e marca a API como pronta.
+
+    Modelos recarregados depois já são aquecidos pelo `GerenteModelo` antes da troca.
+    """
+    global ERRO_AQUECIMENTO
+    inicio = time.perf_counter()
+    try:
+        aquecer(gerente.engine)
+    except Exception as e:
+        ERRO_AQUECIMENTO = str(e)
+        logger.error("❌ Erro ao aquecer o modelo; a API não ficará pronta: %s", e)
+        return
+    TEMPOS_INICIALIZACAO['aquecimento'] = (time.perf_counter() - inicio) * 1000
+    API_PRONTA.set()
+    logger.info("Modelo aquecido em %.0fms; API pronta", TEMPOS_INICIALIZACAO['aquecimento'])
+
+def iniciar_trabalhador_tarefas():
+    """Inicia a thread que processa as tarefas assíncronas (retomando as interrompidas)"""
+    tarefas.iniciar_trabalhador(lambda textos: classificar_em_lote(gerente.engine, textos), TAREFAS_PAUSA_MS / 1000.0)
+
 # Melhorando para garantir que a aplicação não será encerrada após inicialização
 def main():
     logger.info(f"Iniciando API de classificação de tickets na porta {PORT} e host {HOST}...")
+    gerente.iniciar_vigia(MODELO_VERIFICAR_SEGUNDOS)
+    iniciar_trabalhador_tarefas()
+    if aprendiz is not None:
+        aprendiz.retomar()
+        aprendiz.iniciar()
+    # O servidor sobe logo (/livez responde) enquanto o aquecimento roda; /readyz espera por ele
+    threading.Thread(target=aquecer_inicializacao, name='aquecimento', daemon=True).start()
     app.run(host=HOST, port=PORT, debug=False, use_reloader=False, threaded=True)
 
+def main_prefork(trabalhadores=None):
+    """Inicia a API com vários processos que compartilham o modelo já carregado"""
+    from src.api.servidor_prefork import ServidorPrefork
+    global MODO_PREFORK
+    MODO_PREFORK = True
+    trabalhadores = trabalhadores or int(os.environ.get('TRABALHADORES', 0)) or None
+    if aprendiz is not None:
+        aprendiz.retomar()
+    # Aquecido no mestre antes do fork: todos os trabalhadores já nascem prontos
+    aquecer_inicializacao()
+    # O mestre faz fork a cada troca de trabalhadores, então não roda threads (nem a do log):
+    # a vigia do modelo e o aprendizado online rodam no laço do mestre, e as tarefas
+    # assíncronas em um processo auxiliar, fora dos processos que atendem requisições
+    sincronizar()
+    periodicas = [(MODELO_VERIFICAR_SEGUNDOS, lambda: gerente.verificar(servidor.solicitar_reinicio))]
+    if aprendiz is not None:
+        periodicas.append((aprendiz.intervalo, aprendiz.rodada))
+    auxiliares = [('tarefas', lambda parar: tarefas.executar(
+        lambda textos: classificar_em_lote(gerente.engine, textos), TAREFAS_PAUSA_MS / 1000.0, parar=parar))]
+    # O modelo é recarregado uma vez no mestre e os trabalhadores são trocados um a um
+    servidor = ServidorPrefork(app, HOST, PORT, trabalhadores, ao_reiniciar=gerente.recarregar,
+                               periodicas=periodicas, auxiliares=auxiliares)
+    if aprendiz is not None:
+        # Cada versão aprendida chega aos trabalhadores com a troca gradual deles
+        aprendiz.ao_publicar = servidor.solicitar_reinicio
+    servidor.executar()
+    if aprendiz is not None:
+        aprendiz.salvar_checkpoint()
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main() 
@@ -0,0 +1,333 @@
+"""
+Aprendizado online a partir das correções de prioridade enviadas pelos atendentes.
+
+Cada feedback (texto e prioridade correta) é gravado em SQLite. Uma thread
+em segundo plano lê periodicamente o feedback ainda não aplicado, faz passos
+de gradiente da regressão logística (`PontuadorCompilado.ajustar_parcial`)
+sobre uma cópia dos pesos do modelo em uso e publica o resultado no
+`GerenteModelo` com uma troca atômica, sem retreinar do zero. A
+regularização puxa os pesos para os do modelo treinado, então poucas
+correções não descaracterizam o modelo. Feedback repetido para o mesmo texto
+(após normalização) conta uma vez: vale a prioridade mais recente, e ela só é
+aplicada de novo se mudar.
+
+De tempos em tempos os pesos são gravados como artefato em um diretório de
+checkpoint, com o id do último feedback aplicado: ao reiniciar, o
+aprendizado continua de onde parou. Se o modelo base mudar (um novo
+treinamento recarregado do disco), todo o feedback é reaplicado sobre ele.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from src.api.recarga_modelo import aquecer
+from src.api.sqlite_util import conectar_sqlite
+from src.model.artefato_modelo import carregar_artefato, salvar_artefato
+from src.model.motor_inferencia import InferenceEngine, normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+# Estado do aprendizado gravado junto com o artefato do checkpoint
+ESTADO_CHECKPOINT = 'aprendizado.json'
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    texto TEXT NOT NULL,
+    prioridade TEXT NOT NULL,
+    prioridade_prevista TEXT,
+    versao_modelo TEXT,
+    criado_em REAL NOT NULL
+);
+'''
+
+
+def versao_pesos(pontuador):
+    """Identifica o conteúdo dos pesos (usado como versão do modelo atualizado)"""
+    sha = hashlib.sha256(pontuador.pesos.tobytes())
+    sha.update(pontuador.intercept.tobytes())
+    return sha.hexdigest()
+
+
+class RegistroFeedback:
+    """Feedback de prioridade persistido em SQLite, em ordem de chegada"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.executescript(_ESQUEMA)
+
+    @classmethod
+    def a_partir_do_ambiente(cls):
+        """Cria o registro lendo FEEDBACK_BD do ambiente"""
+        return cls(os.environ.get('FEEDBACK_BD', 'feedback.db'))
+
+    def registrar(self, itens, versao_modelo=None):
+        """Grava os itens (texto, prioridade, prioridade prevista ou None) em uma transação; retorna os ids"""
+        agora = time.time()
+        ids = []
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('BEGIN')
+            for texto, prioridade, prevista in itens:
+                cursor = conexao.execute(
+                    'INSERT INTO feedback (texto, prioridade, prioridade_prevista, versao_modelo, criado_em) '
+                    'VALUES (?, ?, ?, ?, ?)', (texto, prioridade, prevista, versao_modelo, agora))
+                ids.append(cursor.lastrowid)
+            conexao.execute('COMMIT')
+        return ids
+
+    def ler(self, apos=0, limite=1000):
+        """Retorna até `limite` itens (id, texto, prioridade) com id maior que `apos`"""
+        with conectar_sqlite(self.caminho) as conexao:
+            return conexao.execute('SELECT id, texto, prioridade FROM feedback WHERE id > ? ORDER BY id LIMIT ?',
+                                   (apos, limite)).fetchall()
+
+    def contar(self, apos=0):
+        """Quantidade de itens com id maior que `apos`"""
+        with conectar_sqlite(self.caminho) as conexao:
+            return conexao.execute('SELECT COUNT(*) FROM feedback WHERE id > ?', (apos,)).fetchone()[0]
+
+
+class AprendizOnline:
+    """Aplica o feedback registrado aos pesos do modelo em uso e publica as novas versões"""
+
+    def __init__(self, gerente, registro, intervalo=60.0, taxa=1.0, epocas=20, regularizacao=0.01,
+                 tamanho_lote=32, diretorio_checkpoint=None, intervalo_checkpoint=300.0):
+        self.gerente = gerente
+        self.registro = registro
+        self.intervalo = intervalo
+        self.taxa = taxa
+        self.epocas = epocas
+        self.regularizacao = regularizacao
+        self.tamanho_lote = tamanho_lote
+        self.diretorio_checkpoint = diretorio_checkpoint
+        self.intervalo_checkpoint = intervalo_checkpoint
+        # Chamado após cada publicação (no pre-fork, para trocar os trabalhadores)
+        self.ao_publicar = None
+        self.ultimo_feedback = 0
+        self.aplicados = 0
+        self.ignorados = 0
+        self.atualizacoes = 0
+        self.ultima_atualizacao = None
+        self.ultima_perda = None
+        self.ultimo_checkpoint = None
+        self.ultimo_erro = None
+        self._base = None
+        self._publicado = None
+        self._trabalho = None
+        self._ultimo_publicado = 0
+        self._ultimo_salvo = 0
+        # Prioridade já aplicada a cada texto normalizado desde o modelo base
+        self._aplicadas = {}
+        self._proximo_checkpoint = time.monotonic() + intervalo_checkpoint
+        self._thread = None
+
+    @classmethod
+    def a_partir_do_ambiente(cls, gerente, registro):
+        """
+        Cria o aprendiz lendo FEEDBACK_INTERVALO_S, FEEDBACK_TAXA, FEEDBACK_EPOCAS,
+        FEEDBACK_REGULARIZACAO, FEEDBACK_LOTE, FEEDBACK_CHECKPOINT e
+        FEEDBACK_CHECKPOINT_S do ambiente.
+
+        Retorna None quando FEEDBACK_INTERVALO_S é 0, o padrão (o feedback só é registrado).
+        """
+        intervalo = float(os.environ.get('FEEDBACK_INTERVALO_S', 0))
+        if intervalo <= 0:
+            return None
+        return cls(
+            gerente, registro,
+            intervalo=intervalo,
+            taxa=float(os.environ.get('FEEDBACK_TAXA', 1.0)),
+            epocas=max(1, int(os.environ.get('FEEDBACK_EPOCAS', 20))),
+            regularizacao=float(os.environ.get('FEEDBACK_REGULARIZACAO', 0.01)),
+            tamanho_lote=max(1, int(os.environ.get('FEEDBACK_LOTE', 32))),
+            diretorio_checkpoint=os.environ.get('FEEDBACK_CHECKPOINT', 'modelo_online') or None,
+            intervalo_checkpoint=float(os.environ.get('FEEDBACK_CHECKPOINT_S', 300)),
+        )
+
+    def _rebasear(self, engine):
+        """Passa a aprender sobre `engine`, descartando as atualizações anteriores"""
+        self._base = self._publicado = engine
+        self._trabalho = engine.pontuador.copiar() if engine.pontuador is not None else None
+        self.ultimo_feedback = self._ultimo_publicado = self._ultimo_salvo = 0
+        self._aplicadas = {}
+        if self._trabalho is None:
+            logger.warning("Modelo sem pontuador compilado; o feedback será registrado, mas não aplicado")
+
+    def retomar(self):
+        """Parte do modelo em uso e, se houver checkpoint dele, continua do último feedback aplicado"""
+        self._rebasear(self.gerente.engine)
+        if self._trabalho is None or not self.diretorio_checkpoint:
+            return False
+        try:
+            with open(os.path.join(self.diretorio_checkpoint, ESTADO_CHECKPOINT), encoding='utf-8') as f:
+                estado = json.load(f)
+        except FileNotFoundError:
+            return False
+        if estado.get('versao_base') != self._base.versao:
+            logger.info("Checkpoint em %s é de outro modelo base; o feedback será reaplicado",
+                        self.diretorio_checkpoint)
+            return False
+        try:
+            pontuador, manifesto = carregar_artefato(self.diretorio_checkpoint, verificar=True)
+            if manifesto['versao_modelo'] != estado.get('versao_modelo'):
+                raise ValueError("manifesto não corresponde ao estado do aprendizado")
+        except Exception as e:
+            logger.warning("Checkpoint em %s ignorado (%s); o feedback será reaplicado", self.diretorio_checkpoint, e)
+            return False
+        self._trabalho = pontuador.copiar()
+        self.ultimo_feedback = self._ultimo_salvo = estado['ultimo_feedback']
+        self._novos_itens(0, self.ultimo_feedback)
+        self.atualizacoes = estado.get('atualizacoes', 0)
+        self._publicar()
+        logger.info("Aprendizado online retomado do checkpoint (feedback até o id %d)", self.ultimo_feedback)
+        return True
+
+    def aplicar_pendentes(self):
+        """Aplica o feedback ainda não incorporado e publica a nova versão; retorna quantos itens foram aplicados"""
+        if self.gerente.engine is not self._publicado:
+            # O modelo foi recarregado do disco: todo o feedback é reaplicado sobre a nova versão
+            logger.info("Modelo base mudou; reaplicando o feedback sobre a versão %s",
+                        (self.gerente.engine.versao or '')[:12])
+            self._rebasear(self.gerente.engine)
+        if self._trabalho is None:
+            return 0
+        novos, ultimo = self._novos_itens(self.ultimo_feedback)
+        self.ultimo_feedback = ultimo
+        aplicados = len(novos)
+        for inicio in range(0, aplicados, self.tamanho_lote):
+            lote = novos[inicio:inicio + self.tamanho_lote]
+            self.ultima_perda = self._trabalho.ajustar_parcial(
+                [texto for texto, _ in lote], [prioridade for _, prioridade in lote],
+                taxa=self.taxa, epocas=self.epocas, regularizacao=self.regularizacao,
+                referencia=self._base.pontuador)
+        if aplicados and self._publicar():
+            self.aplicados += aplicados
+            logger.info("Aprendizado online: %d itens de feedback aplicados (perda antes do ajuste: %.4f)",
+                        aplicados, self.ultima_perda)
+            return aplicados
+        return 0
+
+    def _novos_itens(self, apos, ate=None):
+        """
+        Lê o feedback com id maior que `apos` (até `ate`) e retorna (itens a aplicar, último id lido).
+
+        Cada texto normalizado entra uma vez, com a prioridade mais recente, e
+        só se ela for diferente da já aplicada. Os itens lidos passam a contar
+        como aplicados.
+        """
+        classes = set(self._trabalho.classes)
+        ultimas = {}
+        while ate is None or apos < ate:
+            itens = self.registro.ler(apos, 1000)
+            if ate is not None:
+                itens = [item for item in itens if item[0] <= ate]
+            if not itens:
+                break
+            for _, texto, prioridade in itens:
+                # Prioridades que o modelo não conhece (de um modelo anterior, por exemplo) são ignoradas
+                if prioridade not in classes:
+                    self.ignorados += 1
+                    continue
+                chave = normalizar_texto(texto)
+                ultimas.pop(chave, None)
+                ultimas[chave] = (texto, prioridade)
+            apos = itens[-1][0]
+        novos = []
+        for chave, (texto, prioridade) in ultimas.items():
+            if self._aplicadas.get(chave) != prioridade:
+                self._aplicadas[chave] = prioridade
+                novos.append((texto, prioridade))
+        return novos, apos
+
+    def _publicar(self):
+        """Instala uma cópia dos pesos atuais no gerente; retorna se trocou"""
+        pontuador = self._trabalho.copiar()
+        novo = InferenceEngine(None, None, caminho=self._base.caminho, pontuador=pontuador,
+                               versao=versao_pesos(pontuador))
+        aquecer(novo)
+        if not self.gerente.trocar(novo, esperado=self._publicado):
+            # Recarregado do disco no meio do ajuste: a próxima rodada reaplica o feedback
+            return False
+        self._publicado = novo
+        self._ultimo_publicado = self.ultimo_feedback
+        self.atualizacoes += 1
+        self.ultima_atualizacao = time.time()
+        if self.ao_publicar is not None:
+            self.ao_publicar()
+        return True
+
+    def salvar_checkpoint(self):
+        """Grava os pesos publicados e o último feedback aplicado, se mudaram desde o último checkpoint"""
+        if (not self.diretorio_checkpoint or self._publicado is None or self._publicado is self._base
+                or self._ultimo_publicado == self._ultimo_salvo):
+            return False
+        # O estado antigo é removido antes: um artefato pela metade nunca é retomado com ele
+        caminho_estado = os.path.join(self.diretorio_checkpoint, ESTADO_CHECKPOINT)
+        if os.path.exists(caminho_estado):
+            os.remove(caminho_estado)
+        manifesto = salvar_artefato(self._publicado.pontuador, self.diretorio_checkpoint)
+        estado = {
+            'versao_base': self._base.versao,
+            'versao_modelo': manifesto['versao_modelo'],
+            'ultimo_feedback': self._ultimo_publicado,
+            'atualizacoes': self.atualizacoes,
+            'salvo_em': time.time(),
+        }
+        with open(caminho_estado + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=2)
+        os.replace(caminho_estado + '.tmp', caminho_estado)
+        self._ultimo_salvo = self._ultimo_publicado
+        self.ultimo_checkpoint = estado['salvo_em']
+        logger.info("Checkpoint do aprendizado online gravado em %s (feedback até o id %d)",
+                    self.diretorio_checkpoint, self._ultimo_publicado)
+        return True
+
+    def rodada(self):
+        """Aplica o feedback pendente e grava o checkpoint se já passou `intervalo_checkpoint` desde o último"""
+        try:
+            self.aplicar_pendentes()
+            if time.monotonic() >= self._proximo_checkpoint:
+                self._proximo_checkpoint = time.monotonic() + self.intervalo_checkpoint
+                self.salvar_checkpoint()
+            self.ultimo_erro = None
+        except Exception as e:
+            self.ultimo_erro = str(e)
+            logger.exception("Falha no aprendizado online; mantendo o modelo em uso")
+
+    def executar(self, parar=None):
+        """Laço do aprendiz: uma `rodada` a cada `intervalo` e um checkpoint ao parar"""
+        parar = parar or threading.Event()
+        while not parar.wait(self.intervalo):
+            self.rodada()
+        self.salvar_checkpoint()
+
+    def iniciar(self, ao_publicar=None):
+        """Inicia a thread do aprendiz (uma vez); chame `retomar` antes"""
+        if self._thread is not None:
+            return
+        self.ao_publicar = ao_publicar
+        self._thread = threading.Thread(target=self.executar, name='aprendizado-online', daemon=True)
+        self._thread.start()
+        logger.info("Aprendizado online: feedback aplicado a cada %ss, checkpoint a cada %ss em %s",
+                    self.intervalo, self.intervalo_checkpoint, self.diretorio_checkpoint)
+
+    def estatisticas(self):
+        """Retorna o progresso do aprendizado e a versão publicada"""
+        return {
+            'ultimo_feedback': self.ultimo_feedback,
+            'pendentes': self.registro.contar(self.ultimo_feedback),
+            'aplicados': self.aplicados,
+            'ignorados': self.ignorados,
+            'atualizacoes': self.atualizacoes,
+            'ultima_atualizacao': self.ultima_atualizacao,
+            'ultima_perda': self.ultima_perda,
+            'ultimo_checkpoint': self.ultimo_checkpoint,
+            'ultimo_erro': self.ultimo_erro,
+            'versao_base': self._base.versao if self._base is not None else None,
+            'intervalo_s': self.intervalo,
+        }
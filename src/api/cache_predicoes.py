@@ -0,0 +1,125 @@
+"""
+Cache de predições para os endpoints de classificação.
+
+As chaves combinam a chave do texto no motor (`InferenceEngine.chave`) com a
+versão (hash do conteúdo) do modelo carregado, de modo que uma predição nunca é
+reaproveitada entre versões diferentes de modelo.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachePredicoes:
+    """
+    Cache LRU com expiração (TTL) para resultados de classificação.
+
+    Guarda apenas a prioridade e o dicionário de probabilidades; o texto
+    original de cada requisição continua sendo devolvido pelo endpoint.
+    """
+
+    def __init__(self, max_itens=10000, ttl_segundos=3600, versao_modelo=None):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.versao_modelo = versao_modelo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self.invalidacoes = 0
+
+    @classmethod
+    def a_partir_do_ambiente(cls, versao_modelo=None):
+        """Cria o cache lendo CACHE_MAX_ITENS e CACHE_TTL_SEGUNDOS do ambiente"""
+        return cls(
+            max_itens=int(os.environ.get('CACHE_MAX_ITENS', 10000)),
+            ttl_segundos=float(os.environ.get('CACHE_TTL_SEGUNDOS', 3600)),
+            versao_modelo=versao_modelo,
+        )
+
+    def atualizar_versao(self, versao_modelo):
+        """Registra a versão do modelo em uso, descartando o cache se ela mudou"""
+        with self._lock:
+            if versao_modelo != self.versao_modelo:
+                self._itens.clear()
+                self.versao_modelo = versao_modelo
+                self.invalidacoes += 1
+
+    def _chave(self, texto, versao_modelo, chave_texto):
+        return (versao_modelo or self.versao_modelo, chave_texto(texto) if chave_texto is not None else texto)
+
+    def obter(self, texto, versao_modelo=None, chave_texto=None):
+        """
+        Retorna o resultado em cache para o texto ou None.
+
+        `chave_texto` é a regra de equivalência de textos do motor (por exemplo
+        `engine.chave`); sem ela, só o texto idêntico é encontrado.
+        """
+        chave = self._chave(texto, versao_modelo, chave_texto)
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            expira_em, valor = item
+            if expira_em < agora:
+                del self._itens[chave]
+                self.remocoes += 1
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, texto, valor, versao_modelo=None, chave_texto=None):
+        """Armazena o resultado de um texto, removendo o item menos usado se necessário"""
+        if self.max_itens <= 0:
+            return
+        chave = self._chave(texto, versao_modelo, chave_texto)
+        expira_em = time.monotonic() + self.ttl_segundos
+        with self._lock:
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.remocoes += 1
+
+    def classificar(self, textos, classificar_faltantes, versao_modelo=None, chave_texto=None):
+        """
+        Classifica uma lista de textos consultando o cache primeiro.
+
+        `classificar_faltantes` recebe apenas os textos que não estavam em
+        cache e deve devolver um resultado por texto, na mesma ordem.
+        `versao_modelo` é a versão do modelo que vai classificar; informá-la
+        evita guardar resultados sob a versão errada durante uma troca de modelo.
+        `chave_texto` deve ser o `chave` do mesmo motor, para que o cache
+        considere iguais exatamente os textos que o modelo considera iguais.
+        """
+        versao_modelo = versao_modelo or self.versao_modelo
+        resultados = [self.obter(texto, versao_modelo, chave_texto) for texto in textos]
+        faltantes = [i for i, resultado in enumerate(resultados) if resultado is None]
+        if faltantes:
+            novos = classificar_faltantes([textos[i] for i in faltantes])
+            for i, valor in zip(faltantes, novos):
+                resultados[i] = valor
+                self.guardar(textos[i], valor, versao_modelo, chave_texto)
+        return resultados
+
+    def estatisticas(self):
+        """Retorna os contadores do cache"""
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'ttl_segundos': self.ttl_segundos,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'invalidacoes': self.invalidacoes,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+                'versao_modelo': self.versao_modelo,
+            }
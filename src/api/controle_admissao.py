@@ -0,0 +1,114 @@
+"""
+Controle de admissão para os endpoints de classificação.
+
+O trabalho em andamento é limitado por um orçamento medido em tickets, não em
+requisições: um lote de 1000 tickets ocupa 1000 unidades e um ticket avulso,
+uma. Quando o orçamento está esgotado, as requisições esperam em uma fila
+FIFO por no máximo `espera_max` segundos; se a fila já tiver mais tickets que
+`max_fila`, a requisição é recusada na hora (HTTP 429 com Retry-After), em vez
+de deixar todas as outras mais lentas.
+
+O orçamento é por processo: no modo pre-fork cada trabalhador tem o seu.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class ControleAdmissao:
+    """Orçamento de tickets em processamento com fila limitada"""
+
+    def __init__(self, capacidade=5000, max_fila=20000, espera_max=2.0, retry_after=1):
+        self.capacidade = capacidade
+        self.max_fila = max_fila
+        self.espera_max = espera_max
+        self.retry_after = retry_after
+        self.em_uso = 0
+        self.na_fila = 0
+        self.admitidas = 0
+        self.recusadas = 0
+        self.expiradas = 0
+        self._fila = deque()
+        self._condicao = threading.Condition()
+
+    @classmethod
+    def a_partir_do_ambiente(cls):
+        """
+        Cria o controle lendo ADMISSAO_CAPACIDADE, ADMISSAO_FILA_MAX,
+        ADMISSAO_ESPERA_MAX_MS e ADMISSAO_RETRY_AFTER do ambiente.
+
+        Retorna None quando ADMISSAO_CAPACIDADE é 0 (sem limite).
+        """
+        capacidade = int(os.environ.get('ADMISSAO_CAPACIDADE', 5000))
+        if capacidade <= 0:
+            return None
+        return cls(
+            capacidade=capacidade,
+            max_fila=int(os.environ.get('ADMISSAO_FILA_MAX', capacidade * 4)),
+            espera_max=float(os.environ.get('ADMISSAO_ESPERA_MAX_MS', 2000)) / 1000.0,
+            retry_after=int(os.environ.get('ADMISSAO_RETRY_AFTER', 1)),
+        )
+
+    def adquirir(self, tickets):
+        """
+        Reserva o orçamento para `tickets`, esperando na fila se necessário.
+
+        Retorna o custo reservado (a ser devolvido com `liberar`) ou None se a
+        requisição foi recusada. Lotes maiores que a capacidade custam a
+        capacidade inteira, ou seja, rodam sozinhos.
+        """
+        custo = max(1, min(tickets, self.capacidade))
+        with self._condicao:
+            if not self._fila and self.em_uso + custo <= self.capacidade:
+                self.em_uso += custo
+                self.admitidas += 1
+                return custo
+            if self.na_fila + custo > self.max_fila:
+                self.recusadas += 1
+                return None
+
+            vez = (object(), custo)
+            self._fila.append(vez)
+            self.na_fila += custo
+            limite = time.monotonic() + self.espera_max
+            try:
+                while self._fila[0] is not vez or self.em_uso + custo > self.capacidade:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.expiradas += 1
+                        return None
+                    self._condicao.wait(restante)
+                self.em_uso += custo
+                self.admitidas += 1
+                return custo
+            finally:
+                self._fila.remove(vez)
+                self.na_fila -= custo
+                # O próximo da fila pode ter passado a ser o primeiro
+                self._condicao.notify_all()
+
+    def liberar(self, custo):
+        """Devolve ao orçamento o custo reservado por `adquirir`"""
+        with self._condicao:
+            self.em_uso -= custo
+            self._condicao.notify_all()
+
+    def aguardar_ociosidade(self, timeout):
+        """Espera até `timeout` segundos por nenhuma requisição em processamento ou na fila; retorna se está ociosa"""
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self.em_uso == 0 and not self._fila, timeout)
+
+    def estatisticas(self):
+        """Retorna a ocupação atual e os contadores"""
+        with self._condicao:
+            return {
+                'capacidade': self.capacidade,
+                'em_uso': self.em_uso,
+                'fila_tickets': self.na_fila,
+                'fila_requisicoes': len(self._fila),
+                'max_fila': self.max_fila,
+                'admitidas': self.admitidas,
+                'recusadas': self.recusadas,
+                'expiradas': self.expiradas,
+            }
@@ -0,0 +1,93 @@
+"""
+Faixas de prioridade para separar o tráfego interativo do tráfego de lote.
+
+- Faixa interativa: requisições de um ticket. Tem a sua própria admissão
+  (vagas e fila), então lotes enormes nunca ocupam o lugar delas.
+- Faixa de lote: lotes, streaming e tarefas assíncronas. O trabalho é
+  dividido em fatias, e cada fatia precisa de uma das poucas vagas de lote.
+  Antes de cada fatia, o lote cede a vez enquanto houver requisições
+  interativas em andamento, por no máximo `cessao_max` segundos. Assim a
+  faixa interativa tem prioridade e o lote continua avançando.
+"""
+import os
+import threading
+
+from src.api.controle_admissao import ControleAdmissao
+from src.model.motor_inferencia import LIMITE_LOTE_COMPILADO
+
+
+class FaixasPrioridade:
+    """Vagas e fila da faixa interativa e execução fatiada da faixa de lote"""
+
+    def __init__(self, trabalhadores_interativos=8, trabalhadores_lote=2, tamanho_fatia=LIMITE_LOTE_COMPILADO,
+                 cessao_max=0.05, fila_interativa=None, espera_interativa=1.0):
+        self.interativa = ControleAdmissao(
+            capacidade=trabalhadores_interativos,
+            max_fila=fila_interativa or trabalhadores_interativos * 32,
+            espera_max=espera_interativa,
+        )
+        self.trabalhadores_lote = trabalhadores_lote
+        self.tamanho_fatia = tamanho_fatia
+        self.cessao_max = cessao_max
+        self.fatias = 0
+        self.cessoes = 0
+        self._vagas_lote = threading.BoundedSemaphore(trabalhadores_lote)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def a_partir_do_ambiente(cls):
+        """
+        Cria as faixas lendo FAIXA_INTERATIVA_TRABALHADORES, FAIXA_INTERATIVA_ESPERA_MS,
+        FAIXA_LOTE_TRABALHADORES, FAIXA_LOTE_FATIA e FAIXA_LOTE_CESSAO_MS do ambiente.
+
+        Retorna None quando FAIXA_INTERATIVA_TRABALHADORES é 0 (faixas desativadas, o padrão).
+        """
+        trabalhadores_interativos = int(os.environ.get('FAIXA_INTERATIVA_TRABALHADORES', 0))
+        if trabalhadores_interativos <= 0:
+            return None
+        return cls(
+            trabalhadores_interativos=trabalhadores_interativos,
+            trabalhadores_lote=max(1, int(os.environ.get('FAIXA_LOTE_TRABALHADORES', 2))),
+            tamanho_fatia=max(1, int(os.environ.get('FAIXA_LOTE_FATIA', LIMITE_LOTE_COMPILADO))),
+            cessao_max=float(os.environ.get('FAIXA_LOTE_CESSAO_MS', 50)) / 1000.0,
+            espera_interativa=float(os.environ.get('FAIXA_INTERATIVA_ESPERA_MS', 1000)) / 1000.0,
+        )
+
+    def executar_lote(self, funcao, textos):
+        """
+        Aplica `funcao` a `textos` em fatias pela faixa de lote.
+
+        Retorna a lista com o resultado de cada fatia, na ordem dos textos.
+        """
+        resultados = []
+        for inicio in range(0, len(textos), self.tamanho_fatia):
+            fatia = textos[inicio:inicio + self.tamanho_fatia]
+            with self._vagas_lote:
+                if self.cessao_max > 0 and not self.interativa.aguardar_ociosidade(0):
+                    with self._lock:
+                        self.cessoes += 1
+                    self.interativa.aguardar_ociosidade(self.cessao_max)
+                resultados.append(funcao(fatia))
+            with self._lock:
+                self.fatias += 1
+        return resultados
+
+    def classificar_lote(self, funcao, textos):
+        """`executar_lote` para funções que devolvem uma lista por texto (como `classificar_lote`)"""
+        classificacoes = []
+        for parte in self.executar_lote(funcao, textos):
+            classificacoes.extend(parte)
+        return classificacoes
+
+    def estatisticas(self):
+        """Retorna a ocupação da faixa interativa e os contadores da faixa de lote"""
+        return {
+            'interativa': self.interativa.estatisticas(),
+            'lote': {
+                'trabalhadores': self.trabalhadores_lote,
+                'tamanho_fatia': self.tamanho_fatia,
+                'cessao_max_ms': self.cessao_max * 1000.0,
+                'fatias': self.fatias,
+                'cessoes': self.cessoes,
+            },
+        }
@@ -0,0 +1,60 @@
+"""
+Formatos compactos de resposta para a classificação em lote.
+
+Em vez de um objeto por ticket (texto ecoado + dicionário de probabilidades),
+os nomes das classes são enviados uma única vez, as prioridades como um array
+de índices e as probabilidades como uma matriz em ordem de linhas.
+
+- `compacto`: o mesmo conteúdo em JSON
+- `binario`: corpo `application/octet-stream` com a matriz em float32
+  little-endian (n_tickets x n_classes) seguida dos índices; as classes, o
+  total e o tipo dos índices vão nos cabeçalhos
+"""
+import json
+
+import numpy as np
+
+FORMATOS = ('completo', 'compacto', 'binario')
+TIPO_BINARIO = 'application/octet-stream'
+
+
+def indices_prioridade(probabilidades):
+    """Índice da classe mais provável de cada linha"""
+    return probabilidades.argmax(axis=1) if len(probabilidades) else np.empty(0, dtype=np.intp)
+
+
+def resposta_compacta(classes, probabilidades, casas=None):
+    """Monta o corpo JSON do formato compacto; `casas` arredonda as probabilidades"""
+    indices = indices_prioridade(probabilidades)
+    if casas is not None:
+        probabilidades = np.round(probabilidades, casas)
+    return {
+        'total': len(probabilidades),
+        'classes': list(classes),
+        'prioridades': indices.tolist(),
+        'probabilidades': probabilidades.tolist(),
+    }
+
+
+def codificar_binario(classes, probabilidades):
+    """Retorna (corpo, cabeçalhos) do formato binário"""
+    indices = indices_prioridade(probabilidades)
+    tipo_indices = np.dtype('<u1') if len(classes) <= 256 else np.dtype('<u2')
+    corpo = (np.ascontiguousarray(probabilidades, dtype='<f4').tobytes()
+             + indices.astype(tipo_indices).tobytes())
+    cabecalhos = {
+        'X-Classes': json.dumps(list(classes)),
+        'X-Total': str(len(probabilidades)),
+        'X-Tipo-Indices': tipo_indices.str,
+    }
+    return corpo, cabecalhos
+
+
+def decodificar_binario(corpo, cabecalhos):
+    """Inverso de `codificar_binario`: retorna (classes, índices, probabilidades)"""
+    classes = json.loads(cabecalhos['X-Classes'])
+    total = int(cabecalhos['X-Total'])
+    tamanho_matriz = total * len(classes) * 4
+    probabilidades = np.frombuffer(corpo, dtype='<f4', count=total * len(classes)).reshape(total, len(classes))
+    indices = np.frombuffer(corpo, dtype=np.dtype(cabecalhos['X-Tipo-Indices']), count=total, offset=tamanho_matriz)
+    return classes, indices, probabilidades
@@ -0,0 +1,134 @@
+"""
+Logging assíncrono para a API.
+
+As threads de requisição apenas colocam o registro em uma fila; uma thread
+dedicada formata e escreve no stdout (ou em arquivo). A formatação da mensagem
+também é adiada para essa thread, então os argumentos passados ao logger não
+devem ser alterados depois da chamada. Se a fila encher, os registros
+excedentes são descartados em vez de bloquear o atendimento.
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+FORMATO = '%(asctime)s [%(levelname)s] - %(message)s'
+TAMANHO_FILA = 10000
+
+# (handler, ouvinte) ativos neste processo, recriados após um fork
+_ouvintes = []
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """QueueHandler que não formata na thread chamadora e descarta registros com a fila cheia"""
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+        self.ouvinte = None
+        # Escreve na própria thread, sem fila (ver `sincronizar`)
+        self.sincrono = False
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        if self.sincrono:
+            self.ouvinte.handle(record)
+        else:
+            super().emit(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def close(self):
+        # Chamado por logging.shutdown(): escreve o que ainda está na fila antes de sair
+        ouvinte, self.ouvinte = self.ouvinte, None
+        if ouvinte is not None and ouvinte._thread is not None:
+            ouvinte.queue.put(ouvinte._sentinel)
+            ouvinte._thread.join()
+            ouvinte._thread = None
+        super().close()
+
+
+def configurar_assincrono(logger, handlers, tamanho_fila=TAMANHO_FILA):
+    """Substitui os handlers do logger por uma fila escrita em segundo plano nos `handlers`"""
+    handler = HandlerFila(queue.Queue(tamanho_fila))
+    ouvinte = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    for antigo in list(logger.handlers):
+        logger.removeHandler(antigo)
+    logger.addHandler(handler)
+    handler.ouvinte = ouvinte
+    ouvinte.start()
+    _ouvintes.append((handler, ouvinte))
+    return handler
+
+
+def configurar_logging(nivel='INFO', formato=FORMATO):
+    """Configura o logger raiz para escrever no stdout por meio de uma fila"""
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(logging.Formatter(formato))
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel)
+    return configurar_assincrono(raiz, [saida])
+
+
+def configurar_log_lentas(nome, arquivo=None, formato=FORMATO):
+    """
+    Cria o log de requisições lentas, separado do log principal.
+
+    Sem `arquivo`, as mensagens vão para o stdout junto com o restante do log.
+    """
+    logger = logging.getLogger(nome)
+    logger.setLevel(logging.WARNING)
+    if arquivo:
+        destino = logging.FileHandler(arquivo, encoding='utf-8')
+        destino.setFormatter(logging.Formatter(formato))
+        configurar_assincrono(logger, [destino])
+        logger.propagate = False
+    return logger
+
+
+def amostrador(taxa):
+    """Retorna uma função que responde True para uma fração `taxa` das chamadas"""
+    if taxa >= 1:
+        return lambda: True
+    if taxa <= 0:
+        return lambda: False
+    aleatorio = random.random
+    return lambda: aleatorio() < taxa
+
+
+def sincronizar():
+    """
+    Para as threads dos ouvintes deste processo, que passa a escrever o log diretamente.
+
+    Usado pelo mestre do pre-fork, que não deve ter threads ao fazer fork; os
+    filhos voltam a escrever por meio de uma fila.
+    """
+    for handler, ouvinte in _ouvintes:
+        if handler.ouvinte is None or handler.sincrono:
+            continue
+        ouvinte.stop()
+        handler.sincrono = True
+
+
+def _reiniciar_apos_fork():
+    # A thread do ouvinte não existe no processo filho: cria uma fila e uma thread novas
+    for handler, ouvinte in _ouvintes:
+        if handler.ouvinte is None:
+            continue
+        fila = queue.Queue(handler.queue.maxsize)
+        handler.queue = ouvinte.queue = fila
+        handler.sincrono = False
+        ouvinte._thread = None
+        ouvinte.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
@@ -0,0 +1,195 @@
+"""
+Métricas de latência e vazão no formato de texto do Prometheus.
+
+Os valores são acumulados em fragmentos, cada um com o seu próprio lock. Cada
+thread recebe um fragmento na primeira observação, em rodízio: threads de
+requisição diferentes raramente disputam o mesmo lock, e a soma dos fragmentos só é feita quando o
+endpoint de métricas é lido.
+
+As métricas são por processo: no modo pre-fork cada trabalhador tem as suas.
+"""
+import itertools
+import threading
+from bisect import bisect_left
+
+from src.utils.memoria import memoria_residente
+
+# Limites (em segundos) dos histogramas de latência
+LIMITES_LATENCIA = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Limites dos histogramas de tamanho de lote (tickets por requisição)
+LIMITES_LOTE = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+N_FRAGMENTOS = 16
+
+# Fragmento de cada thread, distribuído em rodízio (o identificador da thread é um
+# endereço alinhado e, em módulo, cairia quase sempre no mesmo fragmento)
+_fragmento_thread = threading.local()
+_proximo_fragmento = itertools.count()
+
+
+def _indice_fragmento():
+    try:
+        return _fragmento_thread.indice
+    except AttributeError:
+        _fragmento_thread.indice = next(_proximo_fragmento) % N_FRAGMENTOS
+        return _fragmento_thread.indice
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra is not None:
+        pares.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Fragmentado:
+    """Base das métricas: um dicionário por fragmento, protegido pelo lock do fragmento"""
+
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._fragmentos = [({}, threading.Lock()) for _ in range(N_FRAGMENTOS)]
+
+    def _fragmento(self):
+        return self._fragmentos[_indice_fragmento()]
+
+    def _cabecalho(self):
+        return [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} {self.tipo}']
+
+
+class Contador(_Fragmentado):
+    """Contador monotônico, opcionalmente com rótulos"""
+
+    tipo = 'counter'
+
+    def inc(self, *rotulos, valor=1):
+        dados, lock = self._fragmento()
+        with lock:
+            dados[rotulos] = dados.get(rotulos, 0) + valor
+
+    def valores(self):
+        """Soma os fragmentos: {tupla de rótulos: valor}"""
+        total = {}
+        for dados, lock in self._fragmentos:
+            with lock:
+                itens = list(dados.items())
+            for chave, valor in itens:
+                total[chave] = total.get(chave, 0) + valor
+        return total
+
+    def renderizar(self):
+        linhas = self._cabecalho()
+        for chave, valor in sorted(self.valores().items()):
+            linhas.append(f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}')
+        return linhas
+
+
+class Histograma(_Fragmentado):
+    """Histograma com limites fixos, no formato cumulativo do Prometheus"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, *rotulos):
+        # Índice do primeiro limite >= valor; o último balde é o +Inf
+        balde = bisect_left(self.limites, valor)
+        dados, lock = self._fragmento()
+        with lock:
+            serie = dados.get(rotulos)
+            if serie is None:
+                serie = dados[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][balde] += 1
+            serie[1] += valor
+
+    def valores(self):
+        """Soma os fragmentos: {tupla de rótulos: (contagens por balde, soma)}"""
+        total = {}
+        for dados, lock in self._fragmentos:
+            with lock:
+                itens = [(chave, (list(contagens), soma)) for chave, (contagens, soma) in dados.items()]
+            for chave, (contagens, soma) in itens:
+                if chave in total:
+                    acumulado, soma_total = total[chave]
+                    total[chave] = ([a + b for a, b in zip(acumulado, contagens)], soma_total + soma)
+                else:
+                    total[chave] = (contagens, soma)
+        return total
+
+    def renderizar(self):
+        linhas = self._cabecalho()
+        for chave, (contagens, soma) in sorted(self.valores().items()):
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float('inf'),), contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, ('le', _formatar_numero(limite)))
+                linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f'{self.nome}_sum{rotulos} {_formatar_numero(soma)}')
+            linhas.append(f'{self.nome}_count{rotulos} {acumulado}')
+        return linhas
+
+
+class Medidor:
+    """Valor instantâneo lido por uma função no momento da coleta"""
+
+    def __init__(self, nome, ajuda, funcao, tipo='gauge'):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.funcao = funcao
+        self.tipo = tipo
+
+    def renderizar(self):
+        valor = self.funcao()
+        if valor is None:
+            return []
+        return [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} {self.tipo}',
+                f'{self.nome} {_formatar_numero(valor)}']
+
+
+class RegistroMetricas:
+    """Conjunto de métricas de um processo, renderizado no formato de texto do Prometheus"""
+
+    TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metricas = []
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        return self._registrar(Histograma(nome, ajuda, rotulos, limites))
+
+    def medidor(self, nome, ajuda, funcao, tipo='gauge'):
+        """Registra um valor lido na coleta (tipo 'counter' para contadores mantidos em outro lugar)"""
+        return self._registrar(Medidor(nome, ajuda, funcao, tipo))
+
+    def renderizar(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.renderizar())
+        return '\n'.join(linhas) + '\n'
+
@@ -0,0 +1,126 @@
+"""
+Despachante de micro-lotes para requisições concorrentes.
+
+Requisições de um único ticket que chegam dentro de uma pequena janela de
+tempo são agrupadas e classificadas com uma única chamada ao modelo, o que
+dilui o custo fixo de cada chamada ao scikit-learn.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class DespachanteMicroLote:
+    """
+    Agrupa textos enviados por várias threads e os classifica em lote.
+
+    `classificar_textos` recebe uma lista de textos e devolve um resultado por
+    texto, na mesma ordem; cada chamada a `classificar` pode informar a sua
+    (o motor da requisição, por exemplo), e os textos de um lote são agrupados
+    por ela. Cada chamador recebe apenas o seu resultado. Se o lote falhar, os
+    textos são classificados um a um, e só os que falharem recebem o erro
+    (com `isolar_falhas=False`, todos recebem o erro do lote).
+    """
+
+    def __init__(self, classificar_textos=None, janela_ms=2.0, max_lote=64, isolar_falhas=True):
+        self.classificar_textos = classificar_textos
+        self.isolar_falhas = isolar_falhas
+        self.janela = janela_ms / 1000.0
+        self.max_lote = max_lote
+        self.lotes_processados = 0
+        self.textos_processados = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        # A thread só é criada no primeiro uso: no pre-fork, o mestre não atende requisições
+        self._fila = None
+
+    def _garantir_thread(self):
+        """Inicia a thread de despacho neste processo (threads não sobrevivem a um fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._fila = queue.Queue()
+                threading.Thread(target=self._executar, args=(self._fila,), name='micro-lote', daemon=True).start()
+                self._pid = os.getpid()
+
+    @classmethod
+    def a_partir_do_ambiente(cls, classificar_textos=None):
+        """
+        Cria o despachante se MICRO_LOTE_JANELA_MS for maior que zero.
+
+        Retorna None quando o micro-lote está desativado (padrão).
+        """
+        janela_ms = float(os.environ.get('MICRO_LOTE_JANELA_MS', 0))
+        if janela_ms <= 0:
+            return None
+        max_lote = int(os.environ.get('MICRO_LOTE_MAX', 64))
+        return cls(classificar_textos, janela_ms=janela_ms, max_lote=max_lote)
+
+    def classificar(self, textos, classificar_textos=None):
+        """Enfileira os textos e aguarda os resultados (os de `classificar_textos`, ou os da função do despachante)"""
+        self._garantir_thread()
+        classificar_textos = classificar_textos or self.classificar_textos
+        futuros = []
+        for texto in textos:
+            futuro = Future()
+            self._fila.put((texto, classificar_textos, futuro))
+            futuros.append(futuro)
+        return [futuro.result() for futuro in futuros]
+
+    def _coletar_lote(self, fila):
+        """Bloqueia até o primeiro item e coleta os demais até a janela expirar ou o lote encher"""
+        lote = [fila.get()]
+        limite = time.monotonic() + self.janela
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self, fila):
+        while True:
+            lote = self._coletar_lote(fila)
+            grupos = {}
+            for texto, classificar_textos, futuro in lote:
+                grupos.setdefault(classificar_textos, []).append((texto, futuro))
+            for classificar_textos, itens in grupos.items():
+                self._classificar_grupo(classificar_textos, itens)
+            self.lotes_processados += 1
+            self.textos_processados += len(lote)
+
+    def _classificar_grupo(self, classificar_textos, itens):
+        """Classifica os itens de uma mesma função; se o lote falhar, tenta cada texto separadamente"""
+        try:
+            resultados = classificar_textos([texto for texto, _ in itens])
+        except Exception as e:
+            if len(itens) == 1 or not self.isolar_falhas:
+                for _, futuro in itens:
+                    futuro.set_exception(e)
+                return
+            for texto, futuro in itens:
+                try:
+                    futuro.set_result(classificar_textos([texto])[0])
+                except Exception as erro:
+                    futuro.set_exception(erro)
+            return
+        for (_, futuro), resultado in zip(itens, resultados):
+            futuro.set_result(resultado)
+
+    def estatisticas(self):
+        """Retorna os contadores do despachante"""
+        lotes = self.lotes_processados
+        return {
+            'janela_ms': self.janela * 1000.0,
+            'max_lote': self.max_lote,
+            'lotes_processados': lotes,
+            'textos_processados': self.textos_processados,
+            'tamanho_medio_lote': self.textos_processados / lotes if lotes else 0.0,
+            'fila': self._fila.qsize() if self._fila is not None else 0,
+        }
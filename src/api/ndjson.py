@@ -0,0 +1,50 @@
+"""
+Leitura de tickets em formato delimitado por linhas (NDJSON ou texto puro).
+
+Cada linha não vazia é um ticket. A linha pode ser uma string JSON, um
+objeto JSON com o campo "texto" ou simplesmente o texto do ticket.
+"""
+import json
+from itertools import islice
+
+
+def extrair_texto(linha):
+    """Extrai o texto do ticket de uma linha; retorna None para linhas vazias"""
+    if isinstance(linha, bytes):
+        linha = linha.decode('utf-8')
+    linha = linha.strip()
+    if not linha:
+        return None
+    if linha[0] in '"{':
+        try:
+            valor = json.loads(linha)
+        except ValueError:
+            return linha
+        if isinstance(valor, str):
+            return valor
+        if isinstance(valor, dict) and isinstance(valor.get('texto'), str):
+            return valor['texto']
+    return linha
+
+
+def ler_tickets(linhas):
+    """Gera os textos dos tickets a partir de um iterável de linhas, ignorando linhas vazias"""
+    for linha in linhas:
+        texto = extrair_texto(linha)
+        if texto is not None:
+            yield texto
+
+
+def em_blocos(iteravel, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens, sem materializá-lo por inteiro"""
+    iterador = iter(iteravel)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def linha_json(objeto):
+    """Serializa um objeto como uma linha NDJSON"""
+    return json.dumps(objeto, ensure_ascii=False) + '\n'
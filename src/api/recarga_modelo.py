@@ -0,0 +1,188 @@
+"""
+Recarga do modelo sem reiniciar a API.
+
+O `GerenteModelo` guarda o motor de inferência em uso. Uma nova versão é
+carregada e aquecida fora do caminho das requisições e só então substitui a
+anterior, com uma única atribuição. Cada requisição lê `gerente.engine` uma
+vez e termina com o motor que obteve, mesmo que a troca aconteça no meio.
+
+A troca pode ser disparada por uma chamada explícita a `recarregar` (por
+exemplo, um endpoint administrativo) ou pela vigia, uma thread que observa o
+arquivo do modelo (mtime e tamanho) e recarrega quando ele muda. Motores
+montados em memória (como os do aprendizado online) são instalados com `trocar`.
+"""
+import logging
+import os
+import threading
+import time
+
+from src.model.artefato_modelo import MANIFESTO
+from src.model.motor_inferencia import LIMITE_LOTE_COMPILADO, InferenceEngine, encontrar_modelo
+
+logger = logging.getLogger(__name__)
+
+# Textos usados para aquecer um modelo recém-carregado antes da troca
+TEXTOS_AQUECIMENTO = [
+    "Sistema não está respondendo após atualização",
+    "Botão de login está com cor errada",
+    "Usuários relatam lentidão ao gerar relatórios",
+]
+
+
+def assinatura_modelo(caminho):
+    """(caminho, mtime, tamanho) do arquivo que identifica o modelo, ou None se não existir"""
+    if caminho is None:
+        return None
+    arquivo = os.path.join(caminho, MANIFESTO) if os.path.isdir(caminho) else caminho
+    try:
+        estado = os.stat(arquivo)
+    except OSError:
+        return None
+    return caminho, estado.st_mtime_ns, estado.st_size
+
+
+def aquecer(engine, textos=TEXTOS_AQUECIMENTO):
+    """Exercita os caminhos de um texto e de lote (incluindo o do scikit-learn) e lê os arrays do modelo"""
+    engine.classificar(textos[0])
+    engine.classificar_lote(textos)
+    if engine.model is not None:
+        engine.classificar_lote(textos * (LIMITE_LOTE_COMPILADO // len(textos) + 1))
+    if engine.pontuador is not None:
+        # Traz para a memória as páginas de um artefato mapeado, evitando falhas de página nas requisições
+        for array in (engine.pontuador.pesos, engine.pontuador.idf, getattr(engine.pontuador.vocabulario, 'hashes', None)):
+            if array is not None:
+                array.sum()
+
+
+class GerenteModelo:
+    """Mantém o motor de inferência em uso e o substitui atomicamente por novas versões"""
+
+    def __init__(self, engine, localizar=encontrar_modelo, ao_trocar=None):
+        self.engine = engine
+        self.localizar = localizar
+        # Callbacks chamados com o novo motor logo após cada troca
+        self.ao_trocar = list(ao_trocar or [])
+        self.recargas = 0
+        self.falhas = 0
+        self.ultima_recarga = None
+        self.ultimo_erro = None
+        # Versão lida do disco por último; o motor em uso pode ser derivado dela (ver `trocar`)
+        self.versao_disco = engine.versao
+        self._assinatura = assinatura_modelo(engine.caminho)
+        self._assinatura_falha = None
+        self._lock = threading.Lock()
+        self._vigia = None
+        self._pendente = None
+
+    def recarregar(self, caminho=None):
+        """
+        Carrega, aquece e instala o modelo de `caminho` (ou o encontrado por `localizar`).
+
+        Retorna um dicionário com o resultado; se a versão for a mesma já lida do disco,
+        nada é trocado (e um motor instalado com `trocar` continua em uso).
+        Erros de carga são propagados e o modelo em uso é mantido.
+        """
+        with self._lock:
+            atual = self.engine
+            caminho = caminho or self.localizar()
+            if caminho is None:
+                raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
+            assinatura = assinatura_modelo(caminho)
+            inicio = time.perf_counter()
+            try:
+                novo = InferenceEngine.carregar(caminho, verificar=True)
+                aquecer(novo)
+            except Exception as e:
+                self.falhas += 1
+                self.ultimo_erro = str(e)
+                self._assinatura_falha = assinatura
+                raise
+            self._assinatura = assinatura
+            self._assinatura_falha = None
+            if novo.versao == self.versao_disco:
+                return {'recarregado': False, 'versao': atual.versao, 'caminho': caminho}
+
+            self._instalar(novo, atual)
+            self.versao_disco = novo.versao
+            self.recargas += 1
+            self.ultima_recarga = time.time()
+            self.ultimo_erro = None
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            logger.info("Modelo recarregado de %s: versão %s -> %s (%.0fms)",
+                        caminho, (atual.versao or '')[:12], (novo.versao or '')[:12], duracao_ms)
+            return {'recarregado': True, 'versao_anterior': atual.versao, 'versao': novo.versao,
+                    'caminho': caminho, 'duracao_ms': duracao_ms}
+
+    def _instalar(self, novo, atual):
+        novo.observar_etapa = atual.observar_etapa
+        self.engine = novo
+        for callback in self.ao_trocar:
+            callback(novo)
+
+    def trocar(self, novo, esperado=None):
+        """
+        Instala um motor já carregado e aquecido (por exemplo, pesos atualizados em memória).
+
+        Com `esperado`, a troca só acontece se o motor em uso ainda for ele; retorna se trocou.
+        """
+        with self._lock:
+            atual = self.engine
+            if esperado is not None and atual is not esperado:
+                return False
+            self._instalar(novo, atual)
+            logger.info("Modelo trocado: versão %s -> %s", (atual.versao or '')[:12], (novo.versao or '')[:12])
+            return True
+
+    def mudou(self):
+        """Retorna a assinatura do modelo em disco se ela difere da carregada (e da última que falhou)"""
+        assinatura = assinatura_modelo(self.localizar())
+        if assinatura is None or assinatura in (self._assinatura, self._assinatura_falha):
+            return None
+        return assinatura
+
+    def verificar(self, ao_detectar=None):
+        """
+        Verifica o modelo em disco uma vez e recarrega (ou chama `ao_detectar`) se ele mudou.
+
+        A mudança só é considerada quando a assinatura se repete em duas
+        verificações seguidas, para não ler um arquivo ainda sendo gravado.
+        """
+        try:
+            assinatura = self.mudou()
+            if assinatura is None or assinatura != self._pendente:
+                self._pendente = assinatura
+                return
+            self._pendente = None
+            (ao_detectar or self.recarregar)()
+        except Exception:
+            logger.exception("Falha ao recarregar o modelo; mantendo a versão em uso")
+
+    def iniciar_vigia(self, intervalo, ao_detectar=None):
+        """
+        Inicia a thread que chama `verificar` a cada `intervalo` segundos.
+
+        Por padrão o modelo é recarregado; `ao_detectar` substitui essa ação.
+        """
+        if intervalo <= 0 or self._vigia is not None:
+            return
+
+        def vigiar():
+            while True:
+                time.sleep(intervalo)
+                self.verificar(ao_detectar)
+
+        self._vigia = threading.Thread(target=vigiar, name='vigia-modelo', daemon=True)
+        self._vigia.start()
+        logger.info("Vigiando o modelo em disco a cada %ss", intervalo)
+
+    def estatisticas(self):
+        """Retorna a versão em uso e os contadores de recarga"""
+        return {
+            'versao': self.engine.versao,
+            'versao_disco': self.versao_disco,
+            'caminho': self.engine.caminho,
+            'recargas': self.recargas,
+            'falhas': self.falhas,
+            'ultima_recarga': self.ultima_recarga,
+            'ultimo_erro': self.ultimo_erro,
+        }
@@ -0,0 +1,231 @@
+"""
+Servidor pre-fork para a API de classificação.
+
+O processo mestre carrega o modelo uma única vez, abre o socket de escuta e
+cria N processos trabalhadores com `fork`. Os trabalhadores herdam o modelo
+já carregado e compartilham suas páginas de memória por copy-on-write, o que
+permite usar todos os núcleos sem N cópias do modelo em RAM.
+
+Sinais tratados pelo mestre:
+  SIGTERM/SIGINT  encerra os trabalhadores de forma graciosa e sai
+  SIGHUP          reinicia os trabalhadores um a um, sem derrubar o serviço
+
+Antes de um reinício, o mestre chama `ao_reiniciar` (se fornecido), o que
+permite recarregar o modelo uma única vez no mestre: os novos trabalhadores
+já nascem com a nova versão, compartilhada entre eles.
+
+Como o mestre faz fork durante toda a sua vida, ele não roda threads: um
+filho criado por um processo com várias threads pode herdar um lock que
+outra thread segurava no momento do fork e travar. O trabalho periódico do
+mestre (`periodicas`) roda no próprio laço de supervisão, e o trabalho de
+fundo contínuo (`auxiliares`) roda em processos filhos supervisionados e
+reiniciados como os trabalhadores.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+# Trabalhadores que morrem antes disso são recriados com atraso, para evitar loops de fork
+TEMPO_MINIMO_VIDA = 1.0
+# Tempo máximo para um trabalhador terminar as requisições em andamento
+TEMPO_ENCERRAMENTO = 30.0
+
+
+class ServidorPrefork:
+    """Mestre que supervisiona trabalhadores WSGI compartilhando um socket"""
+
+    def __init__(self, app, host, port, trabalhadores=None, ao_reiniciar=None, periodicas=(), auxiliares=()):
+        """
+        `periodicas`: pares (intervalo em segundos, função) chamados pelo laço do mestre.
+        `auxiliares`: pares (nome, função) executados cada um em um processo filho; a
+        função recebe um threading.Event sinalizado no SIGTERM e deve retornar ao vê-lo.
+        """
+        self.app = app
+        self.ao_reiniciar = ao_reiniciar
+        self.periodicas = [(intervalo, funcao) for intervalo, funcao in periodicas if intervalo > 0]
+        self.auxiliares = list(auxiliares)
+        self.host = host
+        self.port = port
+        self.trabalhadores = trabalhadores or os.cpu_count() or 1
+        self.socket = None
+        self._filhos = {}  # pid -> (instante de criação, nome, função executada no filho)
+        self._encerrar = False
+        self._reiniciar = False
+
+    def _abrir_socket(self):
+        familia = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.socket(familia, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(128)
+        sock.set_inheritable(True)
+        return sock
+
+    def _criar_processo(self, nome='Trabalhador', alvo=None):
+        alvo = alvo or self._executar_trabalhador
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                alvo()
+            except Exception:
+                logger.exception(f"{nome} encerrado com erro")
+                codigo = 1
+            finally:
+                # os._exit não roda os handlers de saída: descarrega o log antes
+                logging.shutdown()
+                os._exit(codigo)
+        self._filhos[pid] = (time.monotonic(), nome, alvo)
+        logger.info(f"{nome} {pid} iniciado")
+        return pid
+
+    def _criar_auxiliar(self, nome, funcao):
+        def executar():
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+            parar = threading.Event()
+            signal.signal(signal.SIGTERM, lambda signum, frame: parar.set())
+            funcao(parar)
+
+        return self._criar_processo(f"Processo auxiliar '{nome}'", executar)
+
+    def _executar_trabalhador(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        servidor = make_server(self.host, self.port, self.app, threaded=True, fd=self.socket.fileno())
+        # Aguarda as threads de requisição ao fechar, para concluir o que está em andamento
+        servidor.daemon_threads = False
+        servidor.block_on_close = True
+
+        def encerrar(signum, frame):
+            threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, encerrar)
+        servidor.serve_forever()
+        servidor.server_close()
+
+    def _sinal_encerrar(self, signum, frame):
+        self._encerrar = True
+
+    def _sinal_reiniciar(self, signum, frame):
+        self._reiniciar = True
+
+    def solicitar_reinicio(self):
+        """Pede um reinício gradual dos trabalhadores (equivalente a SIGHUP)"""
+        self._reiniciar = True
+
+    def _parar(self, pids, tempo_limite=TEMPO_ENCERRAMENTO):
+        """Envia SIGTERM aos trabalhadores e aguarda, forçando SIGKILL após o tempo limite"""
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        limite = time.monotonic() + tempo_limite
+        pendentes = set(pids)
+        while pendentes and time.monotonic() < limite:
+            for pid in list(pendentes):
+                try:
+                    finalizado, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    finalizado = pid
+                if finalizado:
+                    pendentes.discard(pid)
+                    self._filhos.pop(pid, None)
+            time.sleep(0.05)
+        for pid in pendentes:
+            logger.warning(f"Trabalhador {pid} não encerrou a tempo; forçando")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self._filhos.pop(pid, None)
+
+    def _reiniciar_trabalhadores(self):
+        """Substitui cada trabalhador por um novo, um de cada vez"""
+        if self.ao_reiniciar is not None:
+            try:
+                self.ao_reiniciar()
+            except Exception:
+                logger.exception("Falha ao preparar o reinício; mantendo os trabalhadores atuais")
+                return
+            # Objetos criados pela preparação (um novo modelo, por exemplo) também ficam fora do GC
+            gc.collect()
+            gc.freeze()
+        logger.info("Reiniciando trabalhadores...")
+        for pid, (_, nome, alvo) in list(self._filhos.items()):
+            self._criar_processo(nome, alvo)
+            self._parar([pid])
+        logger.info("Trabalhadores reiniciados")
+
+    def _recolher_mortos(self):
+        """Recria trabalhadores que terminaram inesperadamente"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            filho = self._filhos.pop(pid, None)
+            if filho is None:
+                continue
+            criado_em, nome, alvo = filho
+            logger.warning(f"{nome} {pid} terminou inesperadamente (status {status}); recriando")
+            if time.monotonic() - criado_em < TEMPO_MINIMO_VIDA:
+                time.sleep(TEMPO_MINIMO_VIDA)
+            self._criar_processo(nome, alvo)
+
+    def _executar_periodicas(self, proximas):
+        """Chama as funções periódicas vencidas; `proximas` guarda o próximo instante de cada uma"""
+        for posicao, (intervalo, funcao) in enumerate(self.periodicas):
+            if time.monotonic() < proximas[posicao]:
+                continue
+            try:
+                funcao()
+            except Exception:
+                logger.exception("Falha em uma tarefa periódica do mestre")
+            proximas[posicao] = time.monotonic() + intervalo
+
+    def executar(self):
+        """Abre o socket, cria os trabalhadores e os supervisiona até receber SIGTERM/SIGINT"""
+        self.socket = self._abrir_socket()
+        logger.info(f"Servidor pre-fork ouvindo em {self.host}:{self.port} com {self.trabalhadores} trabalhadores")
+
+        # Move os objetos já carregados (modelo incluído) para a geração permanente do GC,
+        # evitando que as coletas nos filhos toquem essas páginas e quebrem o copy-on-write
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._sinal_encerrar)
+        signal.signal(signal.SIGINT, self._sinal_encerrar)
+        signal.signal(signal.SIGHUP, self._sinal_reiniciar)
+
+        for _ in range(self.trabalhadores):
+            self._criar_processo()
+        for nome, funcao in self.auxiliares:
+            self._criar_auxiliar(nome, funcao)
+
+        proximas = [time.monotonic() + intervalo for intervalo, _ in self.periodicas]
+        try:
+            while not self._encerrar:
+                self._executar_periodicas(proximas)
+                if self._reiniciar:
+                    self._reiniciar = False
+                    self._reiniciar_trabalhadores()
+                self._recolher_mortos()
+                time.sleep(0.2)
+        finally:
+            logger.info("Encerrando trabalhadores...")
+            self._parar(list(self._filhos))
+            self.socket.close()
+            logger.info("Servidor pre-fork encerrado")
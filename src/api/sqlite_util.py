@@ -0,0 +1,32 @@
+"""
+Conexões SQLite compartilhadas pela fila de tarefas e pelo registro de feedback.
+"""
+import sqlite3
+
+
+def conectar_sqlite(caminho):
+    """
+    Abre uma conexão em modo autocommit para uma única operação.
+
+    Use com `with`: a conexão é fechada ao sair e uma transação deixada aberta
+    por uma exceção é desfeita.
+    """
+    # Uma conexão por operação: conexões SQLite não são compartilhadas entre threads
+    conexao = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+    conexao.execute('PRAGMA synchronous=NORMAL')
+    return _Conexao(conexao)
+
+
+class _Conexao:
+    """Gerenciador de contexto que fecha a conexão SQLite ao sair"""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __enter__(self):
+        return self.conexao
+
+    def __exit__(self, tipo, valor, rastreamento):
+        if tipo is not None and self.conexao.in_transaction:
+            self.conexao.execute('ROLLBACK')
+        self.conexao.close()
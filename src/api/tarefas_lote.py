@@ -0,0 +1,314 @@
+"""
+Tarefas assíncronas para lotes muito grandes de tickets.
+
+Um arquivo (CSV ou NDJSON) é gravado em uma fila local em SQLite e devolve
+um id de tarefa. Um trabalhador em segundo plano classifica as tarefas em
+blocos, gravando os resultados e o progresso de cada bloco na mesma
+transação: se o processo for reiniciado, a tarefa continua do último bloco
+concluído. Os resultados são lidos depois, paginados.
+
+Para que várias instâncias possam compartilhar o mesmo banco, cada tarefa é
+reservada por um trabalhador com uma concessão que expira; se o dono morrer,
+outro trabalhador assume a tarefa quando a concessão vence. Um envio
+interrompido no meio (a tarefa fica em "recebendo" sem ser atualizada) não
+pode ser retomado: o trabalhador marca a tarefa como falha e apaga as
+entradas já gravadas.
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from src.api.ndjson import em_blocos
+from src.api.sqlite_util import conectar_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Estados de uma tarefa
+RECEBENDO = 'recebendo'
+PENDENTE = 'pendente'
+PROCESSANDO = 'processando'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+# Tempo (s) que uma tarefa fica reservada por um trabalhador sem renovar a concessão
+TEMPO_CONCESSAO = 60.0
+# Tentativas de um mesmo bloco antes de a tarefa ser marcada como falha
+MAX_TENTATIVAS = 3
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS tarefas (
+    id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    processados INTEGER NOT NULL DEFAULT 0,
+    criada_em REAL NOT NULL,
+    atualizada_em REAL NOT NULL,
+    dono TEXT,
+    concessao_ate REAL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    erro TEXT
+);
+CREATE INDEX IF NOT EXISTS tarefas_estado ON tarefas (estado, criada_em);
+CREATE TABLE IF NOT EXISTS entradas (
+    tarefa_id TEXT NOT NULL,
+    indice INTEGER NOT NULL,
+    texto TEXT NOT NULL,
+    PRIMARY KEY (tarefa_id, indice)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS resultados (
+    tarefa_id TEXT NOT NULL,
+    indice INTEGER NOT NULL,
+    prioridade TEXT NOT NULL,
+    probabilidades TEXT NOT NULL,
+    PRIMARY KEY (tarefa_id, indice)
+) WITHOUT ROWID;
+'''
+
+
+def ler_csv(linhas, coluna=None):
+    """
+    Gera os textos de um CSV a partir de um iterável de linhas em bytes (UTF-8).
+
+    Usa a coluna `coluna` (ou "texto") do cabeçalho; se o cabeçalho não tiver
+    essa coluna, o arquivo é tratado como sem cabeçalho e a primeira coluna é usada.
+    """
+    def decodificar():
+        for numero, linha in enumerate(linhas):
+            texto = linha.decode('utf-8') if isinstance(linha, bytes) else linha
+            yield texto.lstrip('\ufeff') if numero == 0 else texto
+
+    leitor = csv.reader(decodificar())
+    cabecalho = next(leitor, None)
+    if cabecalho is None:
+        return
+    nomes = [nome.strip().lower() for nome in cabecalho]
+    procurada = (coluna or 'texto').lower()
+    if procurada in nomes:
+        posicao = nomes.index(procurada)
+    elif coluna is not None:
+        raise ValueError(f'Coluna "{coluna}" não encontrada no cabeçalho do CSV')
+    else:
+        posicao = 0
+        if cabecalho and cabecalho[0].strip():
+            yield cabecalho[0]
+    for linha in leitor:
+        if len(linha) > posicao and linha[posicao].strip():
+            yield linha[posicao]
+
+
+class FilaTarefas:
+    """Fila de tarefas de classificação persistida em SQLite"""
+
+    def __init__(self, caminho, tamanho_bloco=500):
+        self.caminho = caminho
+        self.tamanho_bloco = tamanho_bloco
+        self._pid = None
+        self._lock = threading.Lock()
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.executescript(_ESQUEMA)
+
+    @classmethod
+    def a_partir_do_ambiente(cls):
+        """Cria a fila lendo TAREFAS_BD e TAREFAS_TAMANHO_BLOCO do ambiente"""
+        return cls(os.environ.get('TAREFAS_BD', 'tarefas.db'),
+                   tamanho_bloco=int(os.environ.get('TAREFAS_TAMANHO_BLOCO', 500)))
+
+    def criar(self, textos):
+        """Grava os textos de uma nova tarefa e a coloca na fila; retorna o id"""
+        tarefa_id = uuid.uuid4().hex
+        agora = time.time()
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('INSERT INTO tarefas (id, estado, criada_em, atualizada_em) VALUES (?, ?, ?, ?)',
+                            (tarefa_id, RECEBENDO, agora, agora))
+        total = 0
+        try:
+            for bloco in em_blocos(textos, 10000):
+                with conectar_sqlite(self.caminho) as conexao:
+                    conexao.execute('BEGIN')
+                    conexao.executemany('INSERT INTO entradas (tarefa_id, indice, texto) VALUES (?, ?, ?)',
+                                        ((tarefa_id, total + i, texto) for i, texto in enumerate(bloco)))
+                    # Mostra que o envio continua ativo (ver `limpar_envios_interrompidos`)
+                    conexao.execute('UPDATE tarefas SET atualizada_em = ? WHERE id = ?', (time.time(), tarefa_id))
+                    conexao.execute('COMMIT')
+                total += len(bloco)
+        except Exception:
+            self.remover(tarefa_id)
+            raise
+        # Só entra na fila depois que todas as entradas foram gravadas
+        estado = PENDENTE if total else CONCLUIDA
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('UPDATE tarefas SET estado = ?, total = ?, atualizada_em = ? WHERE id = ?',
+                            (estado, total, time.time(), tarefa_id))
+        return tarefa_id
+
+    def obter(self, tarefa_id):
+        """Retorna o estado da tarefa ou None se ela não existir"""
+        with conectar_sqlite(self.caminho) as conexao:
+            linha = conexao.execute(
+                'SELECT id, estado, total, processados, criada_em, atualizada_em, erro FROM tarefas WHERE id = ?',
+                (tarefa_id,)).fetchone()
+        if linha is None:
+            return None
+        tarefa_id, estado, total, processados, criada_em, atualizada_em, erro = linha
+        return {
+            'id': tarefa_id,
+            'estado': estado,
+            'total': total,
+            'processados': processados,
+            'progresso': processados / total if total else (1.0 if estado == CONCLUIDA else 0.0),
+            'criada_em': criada_em,
+            'atualizada_em': atualizada_em,
+            'erro': erro,
+        }
+
+    def resultados(self, tarefa_id, inicio=0, limite=1000):
+        """Retorna os resultados já calculados a partir do índice `inicio`, em ordem"""
+        with conectar_sqlite(self.caminho) as conexao:
+            linhas = conexao.execute(
+                'SELECT r.indice, e.texto, r.prioridade, r.probabilidades FROM resultados r '
+                'JOIN entradas e ON e.tarefa_id = r.tarefa_id AND e.indice = r.indice '
+                'WHERE r.tarefa_id = ? AND r.indice >= ? ORDER BY r.indice LIMIT ?',
+                (tarefa_id, inicio, limite)).fetchall()
+        return [
+            {'indice': indice, 'ticket': texto, 'prioridade': prioridade, 'probabilidades': json.loads(probs)}
+            for indice, texto, prioridade, probs in linhas
+        ]
+
+    def remover(self, tarefa_id):
+        """Remove a tarefa, suas entradas e resultados; retorna False se ela não existia"""
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('BEGIN')
+            removidas = conexao.execute('DELETE FROM tarefas WHERE id = ?', (tarefa_id,)).rowcount
+            conexao.execute('DELETE FROM entradas WHERE tarefa_id = ?', (tarefa_id,))
+            conexao.execute('DELETE FROM resultados WHERE tarefa_id = ?', (tarefa_id,))
+            conexao.execute('COMMIT')
+        return removidas > 0
+
+    def contagem_por_estado(self):
+        """Número de tarefas em cada estado"""
+        with conectar_sqlite(self.caminho) as conexao:
+            return dict(conexao.execute('SELECT estado, COUNT(*) FROM tarefas GROUP BY estado').fetchall())
+
+    def limpar_envios_interrompidos(self, inatividade=TEMPO_CONCESSAO):
+        """
+        Marca como falhas as tarefas em "recebendo" sem atualização há `inatividade` segundos.
+
+        As entradas gravadas pelo envio interrompido são apagadas. Retorna o número de tarefas afetadas.
+        """
+        limite = time.time() - inatividade
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            ids = [linha[0] for linha in conexao.execute(
+                'SELECT id FROM tarefas WHERE estado = ? AND atualizada_em < ?', (RECEBENDO, limite))]
+            for tarefa_id in ids:
+                conexao.execute('UPDATE tarefas SET estado = ?, erro = ?, atualizada_em = ? WHERE id = ?',
+                                (FALHOU, 'Envio do arquivo interrompido', time.time(), tarefa_id))
+                conexao.execute('DELETE FROM entradas WHERE tarefa_id = ?', (tarefa_id,))
+            conexao.execute('COMMIT')
+        if ids:
+            logger.warning("%d tarefas com envio interrompido marcadas como falhas", len(ids))
+        return len(ids)
+
+    def _reservar(self, dono):
+        """Reserva a tarefa mais antiga disponível (ou renova a já reservada por `dono`)"""
+        agora = time.time()
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            linha = conexao.execute(
+                'SELECT id, processados, total FROM tarefas '
+                'WHERE estado IN (?, ?) AND (dono IS NULL OR dono = ? OR concessao_ate < ?) '
+                'ORDER BY criada_em LIMIT 1',
+                (PENDENTE, PROCESSANDO, dono, agora)).fetchone()
+            if linha is not None:
+                conexao.execute('UPDATE tarefas SET estado = ?, dono = ?, concessao_ate = ?, atualizada_em = ? '
+                                'WHERE id = ?', (PROCESSANDO, dono, agora + TEMPO_CONCESSAO, agora, linha[0]))
+            conexao.execute('COMMIT')
+        return linha
+
+    def processar_bloco(self, classificar, dono):
+        """
+        Classifica o próximo bloco da tarefa mais antiga.
+
+        `classificar` recebe uma lista de textos e devolve (prioridade,
+        probabilidades) para cada um. Retorna False se não havia trabalho.
+        """
+        reservada = self._reservar(dono)
+        if reservada is None:
+            return False
+        tarefa_id, processados, total = reservada
+        with conectar_sqlite(self.caminho) as conexao:
+            linhas = conexao.execute(
+                'SELECT indice, texto FROM entradas WHERE tarefa_id = ? AND indice >= ? ORDER BY indice LIMIT ?',
+                (tarefa_id, processados, self.tamanho_bloco)).fetchall()
+        try:
+            classificacoes = classificar([texto for _, texto in linhas]) if linhas else []
+        except Exception as e:
+            self._registrar_falha(tarefa_id, e)
+            return True
+
+        fim = processados + len(linhas)
+        estado = CONCLUIDA if fim >= total else PROCESSANDO
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            # Confere que a tarefa ainda é deste trabalhador e não foi removida nem avançada por outro
+            atual = conexao.execute('SELECT processados, dono FROM tarefas WHERE id = ?', (tarefa_id,)).fetchone()
+            if atual != (processados, dono):
+                conexao.execute('ROLLBACK')
+                return True
+            conexao.executemany(
+                'INSERT OR REPLACE INTO resultados (tarefa_id, indice, prioridade, probabilidades) VALUES (?, ?, ?, ?)',
+                ((tarefa_id, indice, prioridade, json.dumps(probs))
+                 for (indice, _), (prioridade, probs) in zip(linhas, classificacoes)))
+            conexao.execute(
+                'UPDATE tarefas SET processados = ?, estado = ?, tentativas = 0, atualizada_em = ?, '
+                'dono = CASE WHEN ? = ? THEN NULL ELSE dono END WHERE id = ?',
+                (fim, estado, time.time(), estado, CONCLUIDA, tarefa_id))
+            conexao.execute('COMMIT')
+        if estado == CONCLUIDA:
+            logger.info("Tarefa %s concluída (%d tickets)", tarefa_id, total)
+        return True
+
+    def _registrar_falha(self, tarefa_id, erro):
+        logger.exception("Erro ao processar bloco da tarefa %s", tarefa_id)
+        with conectar_sqlite(self.caminho) as conexao:
+            conexao.execute(
+                'UPDATE tarefas SET tentativas = tentativas + 1, erro = ?, dono = NULL, atualizada_em = ?, '
+                'estado = CASE WHEN tentativas + 1 >= ? THEN ? ELSE estado END WHERE id = ?',
+                (str(erro), time.time(), MAX_TENTATIVAS, FALHOU, tarefa_id))
+
+    def executar(self, classificar, pausa=0.0, intervalo_ocioso=1.0, parar=None):
+        """
+        Processa tarefas até `parar` (threading.Event) ser sinalizado.
+
+        `pausa` é o tempo de espera entre blocos, que cede a CPU às requisições interativas.
+        """
+        dono = f'{os.uname().nodename}:{os.getpid()}:{threading.get_ident()}'
+        parar = parar or threading.Event()
+        # Envios interrompidos são procurados ao iniciar e, depois, a cada TEMPO_CONCESSAO ocioso
+        proxima_limpeza = 0.0
+        while not parar.is_set():
+            try:
+                trabalhou = self.processar_bloco(classificar, dono)
+                if not trabalhou and time.monotonic() >= proxima_limpeza:
+                    self.limpar_envios_interrompidos()
+                    proxima_limpeza = time.monotonic() + TEMPO_CONCESSAO
+            except Exception:
+                logger.exception("Erro no trabalhador de tarefas")
+                trabalhou = False
+            parar.wait(pausa if trabalhou else intervalo_ocioso)
+
+    def iniciar_trabalhador(self, classificar, pausa=0.0):
+        """Inicia o trabalhador em uma thread deste processo (uma vez por processo)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self.executar, args=(classificar, pausa),
+                                 name='tarefas-lote', daemon=True).start()
+                self._pid = os.getpid()
+
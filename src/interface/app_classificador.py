@@ -1,33 +1,14 @@
-import pickle
-import pandas as pd
-import os
 from flask import Flask, request, jsonify, render_template_string
+from src.model.motor_inferencia import InferenceEngine, encontrar_modelo
 
 # Carregar modelo
-# Tentar vários caminhos possíveis para o modelo
-model_paths = [
-    'modelo_classificacao.pkl',  # Raiz atual
-    '/app/modelo_classificacao.pkl',  # Raiz do container
-    os.path.join(os.path.dirname(__file__), '..', 'model', 'modelo_classificacao.pkl')  # Caminho relativo
-]
-
-model = None
-vectorizer = None
-
-for path in model_paths:
-    try:
-        print(f"Tentando carregar modelo de: {path}")
-        with open(path, 'rb') as f:
-            model, vectorizer = pickle.load(f)
-        print(f"✅ Modelo carregado com sucesso de: {path}")
-        break
-    except FileNotFoundError:
-        print(f"❌ Arquivo não encontrado: {path}")
-        continue
-
-if model is None:
+MODEL_PATH = encontrar_modelo()
+if MODEL_PATH is None:
     raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
 
+engine = InferenceEngine.carregar(MODEL_PATH)
+print(f"✅ Modelo carregado com sucesso de: {MODEL_PATH}")
+
 # Exemplo de uso
 print("\nExemplo de classificação:")
 exemplos = [
@@ -39,15 +20,9 @@ exemplos = [
     "Sistema deu erro"
 ]
 
-# Vetorizar exemplos
-exemplos_vec = vectorizer.transform(exemplos)
-predicoes = model.predict(exemplos_vec)
-probabilidades = model.predict_proba(exemplos_vec)
-
-for i, exemplo in enumerate(exemplos):
+for exemplo, (predicao, probs) in zip(exemplos, engine.classificar_lote(exemplos)):
     print(f"\nTexto: {exemplo}")
-    print(f"Classificação: {predicoes[i]}")
-    probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades[i])}
+    print(f"Classificação: {predicao}")
     print(f"Probabilidades: {probs}")
 
 app = Flask(__name__)
@@ -184,12 +159,7 @@ def classificar():
     texto = data.get('texto', '')
     
     # Classificar o texto
-    texto_vec = vectorizer.transform([texto])
-    prioridade = model.predict(texto_vec)[0]
-    probabilidades = model.predict_proba(texto_vec)[0]
-    
-    # Criar um dicionário de probabilidades
-    probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades)}
+    prioridade, probs = engine.classificar(texto)
     
     return jsonify({
         'prioridade': prioridade,
@@ -1,40 +1,139 @@
-import requests
+import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.api.micro_lote import DespachanteMicroLote
+
+# Endereço da API; pode ser trocado sem alterar o código (ex.: http://localhost:7100 para a API Docker)
+API_URL = os.environ.get('API_URL', 'http://localhost:5000').rstrip('/')
+
+
+class ClienteClassificador:
+    """
+    Cliente reutilizável da API de classificação.
+
+    Mantém uma sessão HTTP com conexões persistentes (keep-alive) e repete
+    automaticamente requisições que falham por conexão, 429 ou 5xx, com espera
+    exponencial (respeitando o Retry-After). Chamadas a `classificar` feitas
+    por várias threads dentro de `janela_ms` são agrupadas em uma única
+    requisição a /classificar-lote, marcada como interativa para que a API não
+    a trate como trabalho de lote.
+    """
+
+    def __init__(self, url_base=API_URL, timeout=10.0, janela_ms=5.0, max_lote=100,
+                 tentativas=3, espera_base=0.5, conexoes=10):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        retentativas = Retry(
+            total=tentativas,
+            backoff_factor=espera_base,
+            status_forcelist=(429, 500, 502, 503, 504),
+            # A classificação não tem efeitos colaterais, então o POST pode ser repetido
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes, max_retries=retentativas)
+        self.sessao = requests.Session()
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+        # Uma falha HTTP vale para o lote todo: não repete cada ticket separadamente
+        self.despachante = DespachanteMicroLote(lambda textos: self.classificar_lote(textos, interativa=True),
+                                                janela_ms=janela_ms, max_lote=max_lote, isolar_falhas=False)
+
+    def _post(self, caminho, dados, cabecalhos=None):
+        resposta = self.sessao.post(self.url_base + caminho, json=dados, headers=cabecalhos, timeout=self.timeout)
+        resposta.raise_for_status()
+        return resposta.json()
+
+    def classificar(self, texto):
+        """Classifica um ticket, agrupado com as chamadas concorrentes em um lote"""
+        return self.despachante.classificar([texto])[0]
+
+    def classificar_lote(self, textos, interativa=False):
+        """
+        Classifica uma lista de tickets em uma única requisição; retorna um resultado por ticket.
+
+        Com `interativa`, a API atende lotes pequenos (até LOTE_INTERATIVO_MAX) na faixa interativa.
+        """
+        cabecalhos = {'X-Prioridade': 'interativa'} if interativa else None
+        return self._post('/api/v1/classificar-lote', {'tickets': list(textos)}, cabecalhos)['resultados']
+
+    def classificar_em_massa(self, textos, tamanho_lote=1000, paralelo=4):
+        """Divide `textos` em lotes enviados em paralelo; retorna os resultados na ordem dos textos"""
+        textos = list(textos)
+        lotes = [textos[inicio:inicio + tamanho_lote] for inicio in range(0, len(textos), tamanho_lote)]
+        resultados = []
+        with ThreadPoolExecutor(max_workers=paralelo) as executor:
+            for parte in executor.map(self.classificar_lote, lotes):
+                resultados.extend(parte)
+        return resultados
+
+    def status(self):
+        """Retorna o status da API"""
+        resposta = self.sessao.get(self.url_base + '/api/v1/status', timeout=self.timeout)
+        resposta.raise_for_status()
+        return resposta.json()
+
+    def fechar(self):
+        """Fecha as conexões da sessão"""
+        self.sessao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+_cliente_padrao = None
+_lock_cliente = threading.Lock()
+
+def cliente_padrao():
+    """Cliente compartilhado pelas funções deste módulo, criado na primeira chamada"""
+    global _cliente_padrao
+    if _cliente_padrao is None:
+        with _lock_cliente:
+            if _cliente_padrao is None:
+                _cliente_padrao = ClienteClassificador()
+    return _cliente_padrao
+
+def _corpo_erro(excecao):
+    """Corpo {"erro": ...} da resposta de erro da API, ou None se não houver"""
+    resposta = getattr(excecao, 'response', None)
+    if resposta is None:
+        return None
+    try:
+        corpo = resposta.json()
+    except ValueError:
+        return None
+    return corpo if isinstance(corpo, dict) and 'erro' in corpo else None
 
 def classificar_ticket(texto):
     """Classifica um único ticket usando a API"""
-    url = "http://localhost:5000/api/v1/classificar"
-    dados = {"texto": texto}
-    
     try:
-        resposta = requests.post(url, json=dados)
-        resposta.raise_for_status()  # Levantar exceção para erros HTTP
-        return resposta.json()
+        return cliente_padrao().classificar(texto)
     except requests.exceptions.RequestException as e:
         print(f"Erro ao classificar ticket: {e}")
-        return None
+        return _corpo_erro(e)
 
 def classificar_lote(tickets):
     """Classifica múltiplos tickets usando a API"""
-    url = "http://localhost:5000/api/v1/classificar-lote"
-    dados = {"tickets": tickets}
-    
     try:
-        resposta = requests.post(url, json=dados)
-        resposta.raise_for_status()
-        return resposta.json()
+        resultados = cliente_padrao().classificar_lote(tickets)
+        return {'total': len(resultados), 'resultados': resultados}
     except requests.exceptions.RequestException as e:
         print(f"Erro ao classificar lote: {e}")
-        return None
+        return _corpo_erro(e)
 
 def verificar_status():
     """Verifica o status da API"""
-    url = "http://localhost:5000/api/v1/status"
-    
     try:
-        resposta = requests.get(url)
-        resposta.raise_for_status()
-        return resposta.json()
+        return cliente_padrao().status()
     except requests.exceptions.RequestException as e:
         print(f"Erro ao verificar status: {e}")
         return None
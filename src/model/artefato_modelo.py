@@ -0,0 +1,240 @@
+"""
+Artefato de modelo mapeável em memória (alternativa ao pickle).
+
+O artefato é um diretório com um `manifesto.json` (versão do formato,
+configuração do vectorizer, classes e SHA-256 de cada arquivo) e os arrays
+numéricos em `.npy`, abertos com `mmap` em vez de copiados. Vários processos
+que carregam o mesmo artefato compartilham uma única cópia física das páginas,
+e o tempo de carga não cresce com o tamanho do vocabulário.
+
+O vocabulário é guardado de forma compacta: hashes de 64 bits ordenados
+(`hashes.npy`), a coluna de cada termo (`colunas.npy`) e os próprios termos
+concatenados em UTF-8 (`termos.bin` + `offsets.npy`), usados para confirmar
+cada busca e descartar colisões. Modelos com vocabulário por hashing (versão 2
+do formato) não têm esses arquivos: basta `n_features` na configuração.
+"""
+import bisect
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+from .pontuador_compilado import PontuadorCompilado, VocabularioHashing
+
+FORMATO = 'classificador-tickets'
+VERSAO_FORMATO = 1
+# Versão sem os arquivos do vocabulário, gravada para modelos com hashing
+VERSAO_FORMATO_HASHING = 2
+MANIFESTO = 'manifesto.json'
+# Arquivos que só existem em algumas variantes do artefato
+ARQUIVOS_OPCIONAIS = ('hashes.npy', 'colunas.npy', 'offsets.npy', 'termos.bin', 'idf.npy')
+# Até este número de termos, a busca no vocabulário é feita termo a termo, sem NumPy
+LIMITE_BUSCA_SIMPLES = 32
+# Termos já resolvidos guardados por processo (o hash de cada termo custa mais que a busca em um dict)
+LIMITE_MEMO_TERMOS = 1 << 14
+
+
+def sha256_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 de um arquivo"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def hash_termo(termo):
+    """Hash de 64 bits de um termo, estável entre processos e execuções"""
+    return int.from_bytes(hashlib.blake2b(termo.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class VocabularioHash:
+    """Vocabulário somente leitura sobre arrays ordenados por hash (interface de `dict.get`)"""
+
+    def __init__(self, hashes, colunas, offsets, termos):
+        self.hashes = hashes
+        self.colunas = colunas
+        self.offsets = offsets
+        self.termos = termos
+        # memoryviews devolvem int do Python sem passar pelos escalares do NumPy (só na ordem de bytes nativa)
+        arrays = (hashes, colunas, offsets)
+        self._visoes = tuple(map(memoryview, arrays)) if all(a.dtype.isnative for a in arrays) else None
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def get(self, termo, padrao=None):
+        coluna = self.buscar([termo])[0]
+        return padrao if coluna is None else coluna
+
+    def buscar(self, termos):
+        """
+        Busca vários termos de uma vez.
+
+        Termos já resolvidos vêm do memo; dos demais, poucos (um ticket) são
+        pesquisados termo a termo com `bisect` e muitos com uma única pesquisa
+        binária vetorizada.
+        """
+        memo = self._memo
+        resultado = [memo.get(termo, -1) for termo in termos]
+        faltantes = [i for i, coluna in enumerate(resultado) if coluna == -1]
+        if not faltantes:
+            return resultado
+        novos = [termos[i] for i in faltantes]
+        if self._visoes is not None and len(novos) <= LIMITE_BUSCA_SIMPLES:
+            colunas = self._buscar_poucos(novos)
+        else:
+            colunas = self._buscar_vetorizado(novos)
+        memorizar = len(novos) <= LIMITE_MEMO_TERMOS
+        if memorizar and len(memo) + len(novos) > LIMITE_MEMO_TERMOS:
+            memo.clear()
+        for i, termo, coluna in zip(faltantes, novos, colunas):
+            resultado[i] = coluna
+            if memorizar:
+                memo[termo] = coluna
+        return resultado
+
+    def _buscar_poucos(self, termos):
+        hashes, colunas, offsets = self._visoes
+        resultado = []
+        for termo in termos:
+            codificado = termo.encode('utf-8')
+            valor = int.from_bytes(hashlib.blake2b(codificado, digest_size=8).digest(), 'little')
+            posicao = bisect.bisect_left(hashes, valor)
+            if (posicao < len(hashes) and hashes[posicao] == valor
+                    and self.termos[offsets[posicao]:offsets[posicao + 1]] == codificado):
+                resultado.append(colunas[posicao])
+            else:
+                resultado.append(None)
+        return resultado
+
+    def _buscar_vetorizado(self, termos):
+        codificados = [termo.encode('utf-8') for termo in termos]
+        valores = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(codificado, digest_size=8).digest(), 'little') for codificado in codificados),
+            dtype=np.uint64, count=len(codificados),
+        )
+        posicoes = np.minimum(np.searchsorted(self.hashes, valores), max(len(self.hashes) - 1, 0))
+        achados = self.hashes[posicoes] == valores if len(self.hashes) else np.zeros(len(valores), dtype=bool)
+        resultado = [None] * len(termos)
+        for i in np.flatnonzero(achados).tolist():
+            posicao = int(posicoes[i])
+            inicio, fim = int(self.offsets[posicao]), int(self.offsets[posicao + 1])
+            if self.termos[inicio:fim] == codificados[i]:
+                resultado[i] = int(self.colunas[posicao])
+        return resultado
+
+    def items(self):
+        for posicao in range(len(self.hashes)):
+            inicio, fim = int(self.offsets[posicao]), int(self.offsets[posicao + 1])
+            yield self.termos[inicio:fim].decode('utf-8'), int(self.colunas[posicao])
+
+
+def salvar_artefato(pontuador, diretorio):
+    """Grava o pontuador como artefato versionado em `diretorio`; retorna o manifesto"""
+    os.makedirs(diretorio, exist_ok=True)
+    hashing = isinstance(pontuador.vocabulario, VocabularioHashing)
+
+    arrays = {
+        'pesos.npy': pontuador.pesos,
+        'intercept.npy': pontuador.intercept,
+    }
+    if not hashing:
+        termos = list(pontuador.vocabulario.items())
+        codificados = [(hash_termo(termo), termo.encode('utf-8'), coluna) for termo, coluna in termos]
+        codificados.sort(key=lambda item: item[0])
+        hashes = np.array([item[0] for item in codificados], dtype=np.uint64)
+        if len(hashes) and (np.diff(hashes) == 0).any():
+            raise ValueError("Colisão de hash no vocabulário; não é possível gravar o artefato")
+        offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item[1]) for item in codificados])
+        arrays['hashes.npy'] = hashes
+        arrays['colunas.npy'] = np.array([item[2] for item in codificados], dtype=np.int32)
+        arrays['offsets.npy'] = offsets
+    if pontuador.idf is not None:
+        arrays['idf.npy'] = pontuador.idf
+    # Cada arquivo é gravado em um temporário e renomeado: processos que ainda mapeiam a
+    # versão anterior continuam lendo o arquivo antigo em vez de vê-lo truncado
+    for nome, array in arrays.items():
+        with open(os.path.join(diretorio, nome + '.tmp'), 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(os.path.join(diretorio, nome + '.tmp'), os.path.join(diretorio, nome))
+    nomes = list(arrays)
+    if not hashing:
+        with open(os.path.join(diretorio, 'termos.bin.tmp'), 'wb') as f:
+            f.write(b''.join(item[1] for item in codificados))
+        os.replace(os.path.join(diretorio, 'termos.bin.tmp'), os.path.join(diretorio, 'termos.bin'))
+        nomes.append('termos.bin')
+
+    arquivos = {nome: sha256_arquivo(os.path.join(diretorio, nome)) for nome in nomes}
+    manifesto = {
+        'formato': FORMATO,
+        'versao_formato': VERSAO_FORMATO_HASHING if hashing else VERSAO_FORMATO,
+        'classes': pontuador.classes,
+        'config': pontuador.config,
+        'n_features': int(pontuador.pesos.shape[0]),
+        'arquivos': arquivos,
+        # A versão do modelo é derivada do conteúdo de todos os arquivos
+        'versao_modelo': hashlib.sha256(json.dumps(arquivos, sort_keys=True).encode()).hexdigest(),
+    }
+    # O manifesto é escrito por último e de forma atômica: sem ele o artefato não é carregado
+    temporario = os.path.join(diretorio, MANIFESTO + '.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, os.path.join(diretorio, MANIFESTO))
+    # Remove os arquivos de uma variante anterior gravada no mesmo diretório
+    for nome in ARQUIVOS_OPCIONAIS:
+        if nome not in arquivos and os.path.exists(os.path.join(diretorio, nome)):
+            os.remove(os.path.join(diretorio, nome))
+    return manifesto
+
+
+def ler_manifesto(diretorio):
+    """Lê e valida o manifesto do artefato"""
+    with open(os.path.join(diretorio, MANIFESTO), encoding='utf-8') as f:
+        manifesto = json.load(f)
+    if manifesto.get('formato') != FORMATO:
+        raise ValueError(f"Diretório {diretorio} não contém um artefato de modelo")
+    if manifesto.get('versao_formato') not in (VERSAO_FORMATO, VERSAO_FORMATO_HASHING):
+        raise ValueError(f"Versão de artefato não suportada: {manifesto.get('versao_formato')}")
+    return manifesto
+
+
+def verificar_artefato(diretorio, manifesto=None):
+    """Confere o SHA-256 de todos os arquivos do artefato, levantando ValueError se algum divergir"""
+    manifesto = manifesto or ler_manifesto(diretorio)
+    for nome, esperado in manifesto['arquivos'].items():
+        if sha256_arquivo(os.path.join(diretorio, nome)) != esperado:
+            raise ValueError(f"Checksum inválido para {nome} no artefato {diretorio}")
+    return manifesto
+
+
+def carregar_artefato(diretorio, verificar=False):
+    """
+    Carrega o artefato como PontuadorCompilado, mapeando os arrays em memória.
+
+    Com `verificar=True` os checksums são conferidos antes (o que lê todos os arquivos).
+    Retorna (pontuador, manifesto).
+    """
+    manifesto = ler_manifesto(diretorio)
+    if verificar:
+        verificar_artefato(diretorio, manifesto)
+
+    def abrir(nome):
+        # Visão ndarray comum sobre o mapeamento (sem cópia), evitando o custo de indexar np.memmap
+        return np.asarray(np.load(os.path.join(diretorio, nome), mmap_mode='r', allow_pickle=False))
+
+    if manifesto['config'].get('vocabulario') == 'hashing':
+        vocabulario = VocabularioHashing(manifesto['config']['n_features'])
+    else:
+        with open(os.path.join(diretorio, 'termos.bin'), 'rb') as f:
+            termos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        vocabulario = VocabularioHash(abrir('hashes.npy'), abrir('colunas.npy'), abrir('offsets.npy'), termos)
+    idf = abrir('idf.npy') if 'idf.npy' in manifesto['arquivos'] else None
+    pesos = abrir('pesos.npy')
+    pontuador = PontuadorCompilado(vocabulario, idf, pesos.T, abrir('intercept.npy'),
+                                   manifesto['classes'], manifesto['config'])
+    return pontuador, manifesto
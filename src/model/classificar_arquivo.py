@@ -0,0 +1,215 @@
+"""
+Classificação offline de arquivos grandes de tickets (CSV ou Parquet).
+
+O arquivo é lido em blocos, que são distribuídos entre processos
+trabalhadores (cada um carrega o modelo uma única vez) e gravados em ordem no
+CSV de saída assim que ficam prontos. Após cada bloco gravado, o progresso é
+salvo em `<saida>.progresso`; uma execução interrompida continua do último
+bloco concluído ao ser chamada de novo com os mesmos argumentos e o mesmo
+modelo. As colunas do arquivo são mantidas; a classificação vai em
+`prioridade_prevista` e `prob_<classe>`.
+
+Uso:
+    python main.py classify-file tickets.csv [-o saida.csv] [-p PROCESSOS] [-b TAMANHO_BLOCO]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .motor_inferencia import InferenceEngine, encontrar_modelo
+
+TAMANHO_BLOCO = 10000
+
+# Motor de cada processo trabalhador, carregado uma vez pelo inicializador do pool
+_engine = None
+
+
+def _inicializar_trabalhador(caminho_modelo):
+    global _engine
+    _engine = InferenceEngine.carregar(caminho_modelo)
+
+
+def _pontuar_bloco(textos):
+    return _engine.pontuar(textos)
+
+
+def ler_blocos(entrada, tamanho_bloco):
+    """Retorna (DataFrames de até `tamanho_bloco` linhas, total de linhas ou None se desconhecido)"""
+    if entrada.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Leitura de Parquet requer o pacote pyarrow (pip install pyarrow)")
+        arquivo = pq.ParquetFile(entrada)
+        blocos = (lote.to_pandas() for lote in arquivo.iter_batches(batch_size=tamanho_bloco))
+        return blocos, arquivo.metadata.num_rows
+    blocos = pd.read_csv(entrada, chunksize=tamanho_bloco, dtype=str, keep_default_na=False)
+    return blocos, None
+
+
+def _ler_progresso(caminho, assinatura):
+    if not os.path.exists(caminho):
+        return {'blocos': 0, 'linhas': 0, 'bytes_saida': 0}
+    with open(caminho, encoding='utf-8') as f:
+        progresso = json.load(f)
+    if progresso.get('assinatura') != assinatura:
+        raise SystemExit(f"{caminho} pertence a outra execução (arquivo, coluna, tamanho de bloco ou modelo "
+                         "diferentes). "
+                         "Remova-o, ou a saída, para recomeçar.")
+    return progresso
+
+
+def _salvar_progresso(caminho, progresso):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(progresso, f)
+    os.replace(temporario, caminho)
+
+
+def _montar_saida(bloco, classes, probabilidades):
+    indices = probabilidades.argmax(axis=1)
+    saida = bloco.copy()
+    saida['prioridade_prevista'] = np.asarray(classes, dtype=object)[indices]
+    for posicao, classe in enumerate(classes):
+        saida[f'prob_{classe}'] = probabilidades[:, posicao]
+    return saida
+
+
+def classificar_arquivo(entrada, saida, coluna='texto', processos=None, tamanho_bloco=TAMANHO_BLOCO,
+                        caminho_modelo=None, mostrar_progresso=True):
+    """
+    Classifica `entrada` e grava `saida` (CSV), retomando uma execução interrompida.
+
+    Retorna o número de linhas classificadas nesta execução.
+    """
+    caminho_modelo = caminho_modelo or encontrar_modelo()
+    if caminho_modelo is None:
+        raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
+    processos = processos or os.cpu_count() or 1
+    if os.path.realpath(saida) == os.path.realpath(entrada):
+        raise SystemExit("A saída não pode ser o próprio arquivo de entrada")
+
+    caminho_progresso = saida + '.progresso'
+    if not os.path.exists(caminho_progresso) and os.path.exists(saida) and os.path.getsize(saida) > 0:
+        raise SystemExit(f"{saida} já existe e não há progresso a retomar. Remova-o ou escolha outra saída.")
+
+    engine = InferenceEngine.carregar(caminho_modelo)
+    classes = engine.classes
+    assinatura = {'entrada': os.path.abspath(entrada), 'coluna': coluna, 'tamanho_bloco': tamanho_bloco,
+                  'versao_modelo': engine.versao}
+    del engine
+    progresso = _ler_progresso(caminho_progresso, assinatura)
+    progresso['assinatura'] = assinatura
+    if progresso['blocos']:
+        print(f"Retomando após {progresso['linhas']} linhas ({progresso['blocos']} blocos)", file=sys.stderr)
+
+    # Descarta um bloco gravado pela metade em uma execução interrompida
+    with open(saida, 'ab') as f:
+        f.truncate(progresso['bytes_saida'])
+
+    blocos, total = ler_blocos(entrada, tamanho_bloco)
+
+    def pendentes():
+        for numero, bloco in enumerate(blocos):
+            if numero < progresso['blocos']:
+                continue
+            if coluna not in bloco.columns:
+                raise SystemExit(f'Coluna "{coluna}" não encontrada em {entrada}')
+            yield bloco
+
+    if processos > 1:
+        pool = multiprocessing.Pool(processos, initializer=_inicializar_trabalhador, initargs=(caminho_modelo,))
+        pontuar = lambda textos: pool.apply_async(_pontuar_bloco, (textos,))
+    else:
+        pool = None
+        _inicializar_trabalhador(caminho_modelo)
+        pontuar = lambda textos: _Pronto(_pontuar_bloco(textos))
+
+    inicio = time.perf_counter()
+    linhas_sessao = 0
+    try:
+        with open(saida, 'a', encoding='utf-8', newline='') as arquivo_saida:
+            # Mantém no máximo 2 blocos por processo em andamento, para limitar a memória
+            em_andamento = deque()
+            iterador = pendentes()
+            esgotado = False
+            while True:
+                while not esgotado and len(em_andamento) < 2 * processos:
+                    bloco = next(iterador, None)
+                    if bloco is None:
+                        esgotado = True
+                        break
+                    em_andamento.append((bloco, pontuar(bloco[coluna].astype(str).tolist())))
+                if not em_andamento:
+                    break
+
+                bloco, resultado = em_andamento.popleft()
+                _montar_saida(bloco, classes, resultado.get()).to_csv(
+                    arquivo_saida, header=progresso['bytes_saida'] == 0, index=False)
+                arquivo_saida.flush()
+                os.fsync(arquivo_saida.fileno())
+
+                progresso['blocos'] += 1
+                progresso['linhas'] += len(bloco)
+                progresso['bytes_saida'] = arquivo_saida.tell()
+                _salvar_progresso(caminho_progresso, progresso)
+                linhas_sessao += len(bloco)
+
+                if mostrar_progresso:
+                    decorrido = time.perf_counter() - inicio
+                    percentual = f" ({progresso['linhas'] / total:.1%})" if total else ''
+                    print(f"\r{progresso['linhas']} linhas{percentual} - {linhas_sessao / decorrido:,.0f} linhas/s",
+                          end='', file=sys.stderr, flush=True)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    if mostrar_progresso:
+        print(file=sys.stderr)
+    return linhas_sessao
+
+
+class _Pronto:
+    """Resultado já calculado com a interface de AsyncResult (usado sem pool)"""
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def get(self):
+        return self.valor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py classify-file',
+                                     description="Classifica um arquivo CSV ou Parquet de tickets")
+    parser.add_argument('entrada', help="Arquivo .csv ou .parquet com os tickets")
+    parser.add_argument('-o', '--saida', help="CSV de saída (padrão: <entrada>_classificado.csv)")
+    parser.add_argument('-c', '--coluna', default='texto', help="Coluna com o texto dos tickets (padrão: texto)")
+    parser.add_argument('-p', '--processos', type=int, default=None, help="Processos trabalhadores (padrão: núcleos)")
+    parser.add_argument('-b', '--tamanho-bloco', type=int, default=TAMANHO_BLOCO, help="Linhas por bloco")
+    parser.add_argument('-m', '--modelo', default=None, help="Caminho do modelo (padrão: o encontrado)")
+    args = parser.parse_args(argv)
+
+    saida = args.saida or os.path.splitext(args.entrada)[0] + '_classificado.csv'
+    inicio = time.perf_counter()
+    try:
+        linhas = classificar_arquivo(args.entrada, saida, coluna=args.coluna, processos=args.processos,
+                                     tamanho_bloco=args.tamanho_bloco, caminho_modelo=args.modelo)
+    except KeyboardInterrupt:
+        print("\nInterrompido. Execute o mesmo comando para continuar de onde parou.", file=sys.stderr)
+        raise SystemExit(130)
+    print(f"{linhas} linhas classificadas em {time.perf_counter() - inicio:.1f}s; resultados em '{saida}'")
+    # Execução concluída: o arquivo de progresso não é mais necessário
+    if os.path.exists(saida + '.progresso'):
+        os.remove(saida + '.progresso')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Motor de inferência compartilhado por todos os pontos de entrada.
+
+Centraliza o carregamento do modelo e a classificação de textos. A
+prioridade é obtida pelo argmax das probabilidades, de modo que o modelo é
+avaliado uma única vez por lote.
+
+Lotes são deduplicados antes da vetorização: textos iguais após a
+normalização (minúsculas e espaços colapsados) são pontuados uma única vez e
+o resultado é replicado na ordem original.
+
+O modelo pode vir do pickle `(model, vectorizer)` ou do artefato mapeável em
+memória gravado pelo treinamento (ver `artefato_modelo`). Quando os dois
+existem no mesmo local, vale o gravado por último: o treinamento grava o
+artefato depois do pickle, e um pickle copiado depois continua sendo o usado.
+"""
+import os
+import pickle
+import time
+
+import numpy as np
+
+from .artefato_modelo import MANIFESTO, carregar_artefato, sha256_arquivo
+from .pontuador_compilado import PontuadorCompilado
+
+# Locais onde o modelo costuma estar, em ordem de preferência: (pickle, artefato mapeável)
+LOCAIS_MODELO = [
+    ('modelo_classificacao.pkl', 'modelo_artefato'),  # Raiz atual
+    ('/app/modelo_classificacao.pkl', '/app/modelo_artefato'),  # Raiz do container
+    (os.path.join(os.path.dirname(__file__), 'modelo_classificacao.pkl'),
+     os.path.join(os.path.dirname(__file__), 'modelo_artefato')),  # Diretório do modelo
+]
+CAMINHOS_MODELO = [caminho for local in LOCAIS_MODELO for caminho in local]
+
+# Até este tamanho de lote o pontuador compilado é mais rápido que o scikit-learn
+LIMITE_LOTE_COMPILADO = 1000
+
+
+def normalizar_texto(texto):
+    """Normaliza o texto (minúsculas e espaços colapsados); textos com a mesma forma têm a mesma predição"""
+    return ' '.join(str(texto).lower().split())
+
+
+def _modificado_em(caminho):
+    """Instante da última gravação do modelo, ou None se ele não existe (um artefato só conta com o manifesto)"""
+    if os.path.isdir(caminho):
+        caminho = os.path.join(caminho, MANIFESTO)
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+
+
+def encontrar_modelo(caminhos=None):
+    """
+    Retorna o caminho do modelo (artefato ou pickle) ou None.
+
+    Com `caminhos`, retorna o primeiro existente. Sem eles, usa o primeiro de
+    LOCAIS_MODELO com algum modelo e, se ele tiver os dois, o gravado por último.
+    """
+    if caminhos is not None:
+        return next((caminho for caminho in caminhos if _modificado_em(caminho) is not None), None)
+    for local in LOCAIS_MODELO:
+        existentes = [(_modificado_em(caminho), caminho) for caminho in local]
+        existentes = [item for item in existentes if item[0] is not None]
+        if existentes:
+            return max(existentes)[1]
+    return None
+
+
+class InferenceEngine:
+    """
+    Classificador de tickets baseado no par (modelo, vectorizer) treinado.
+
+    Quando criado a partir de um artefato, `model` e `vectorizer` são None e
+    toda a pontuação é feita pelo pontuador compilado.
+    """
+
+    def __init__(self, model, vectorizer, caminho=None, usar_compilado=True, pontuador=None, versao=None):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.caminho = caminho
+        # Identifica o conteúdo do modelo (usado, por exemplo, como chave do cache de predições)
+        self.versao = versao
+        self.pontuador = pontuador
+        if self.pontuador is None and usar_compilado and model is not None:
+            try:
+                self.pontuador = PontuadorCompilado.a_partir_do_sklearn(model, vectorizer)
+            except ValueError:
+                self.pontuador = None
+        # Callback opcional `observar_etapa(etapa, segundos)` para medir vetorização e predição
+        self.observar_etapa = None
+        # Lista de classes calculada uma única vez, como str nativas do Python
+        origem = model.classes_ if model is not None else self.pontuador.classes
+        self.classes = [str(classe) for classe in origem]
+        # A normalização só preserva a predição se o vectorizer converte para minúsculas
+        config = self.pontuador.config if self.pontuador is not None else vectorizer.get_params()
+        self._normalizar = bool(config.get('lowercase')) and config.get('analyzer', 'word') == 'word'
+
+    @classmethod
+    def carregar(cls, caminho=None, verificar=False):
+        """
+        Carrega o modelo de um artefato (diretório) ou de um arquivo pickle.
+
+        Sem `caminho`, procura nos locais padrão de LOCAIS_MODELO. Com
+        `verificar=True`, os checksums de um artefato são conferidos.
+        """
+        if caminho is None:
+            caminho = encontrar_modelo()
+            if caminho is None:
+                raise FileNotFoundError("Não foi possível encontrar o arquivo do modelo em nenhum caminho!")
+        if os.path.isdir(caminho):
+            return cls.do_artefato(caminho, verificar=verificar)
+        with open(caminho, 'rb') as f:
+            model, vectorizer = pickle.load(f)
+        return cls(model, vectorizer, caminho=caminho, versao=sha256_arquivo(caminho))
+
+    @classmethod
+    def do_artefato(cls, diretorio, verificar=False):
+        """
+        Carrega o modelo de um artefato mapeável em memória, sem o modelo do scikit-learn.
+
+        A variante com hashing ainda importa do scikit-learn a função MurmurHash3.
+        """
+        pontuador, manifesto = carregar_artefato(diretorio, verificar=verificar)
+        return cls(None, None, caminho=diretorio, pontuador=pontuador, versao=manifesto['versao_modelo'])
+
+    def chave(self, texto):
+        """Chave de deduplicação e de cache: textos com a mesma chave têm a mesma predição neste modelo"""
+        return normalizar_texto(texto) if self._normalizar else texto
+
+    def deduplicar(self, textos):
+        """
+        Retorna (textos únicos, índice do único de cada texto).
+
+        O índice é None quando não há repetições, caso em que os textos são usados como estão.
+        """
+        chaves = [self.chave(texto) for texto in textos] if self._normalizar else textos
+        posicoes = {}
+        inversos = [posicoes.setdefault(chave, len(posicoes)) for chave in chaves]
+        if len(posicoes) == len(textos):
+            return textos, None
+        return list(posicoes), inversos
+
+    def pontuar(self, textos):
+        """Retorna a matriz de probabilidades (n_textos x n_classes), pontuando cada texto distinto uma vez"""
+        if len(textos) > 1:
+            unicos, inversos = self.deduplicar(textos)
+            if inversos is not None:
+                return self._pontuar(unicos)[np.asarray(inversos, dtype=np.intp)]
+        return self._pontuar(textos)
+
+    def _pontuar(self, textos):
+        if self.model is None or (self.pontuador is not None and len(textos) <= LIMITE_LOTE_COMPILADO):
+            vetorizar, prever = self.pontuador.vetorizar, self.pontuador.prever
+        else:
+            vetorizar, prever = self.vectorizer.transform, self.model.predict_proba
+
+        observar = self.observar_etapa
+        if observar is None:
+            return prever(vetorizar(textos))
+        inicio = time.perf_counter()
+        vetores = vetorizar(textos)
+        meio = time.perf_counter()
+        probabilidades = prever(vetores)
+        observar('vetorizar', meio - inicio)
+        observar('prever', time.perf_counter() - meio)
+        return probabilidades
+
+    def classificar_lote(self, textos):
+        """Classifica uma lista de textos, retornando (prioridade, probabilidades) para cada um"""
+        if not textos:
+            return []
+        unicos, inversos = self.deduplicar(textos) if len(textos) > 1 else (textos, None)
+        classes = self.classes
+        resultados = []
+        # Uma única conversão para listas Python; o argmax por linha é feito sobre elas
+        for linha in self._pontuar(unicos).tolist():
+            resultados.append((classes[linha.index(max(linha))], dict(zip(classes, linha))))
+        if inversos is None:
+            return resultados
+        # Textos repetidos compartilham o mesmo resultado
+        return [resultados[indice] for indice in inversos]
+
+    def classificar(self, texto):
+        """Classifica um único texto, retornando (prioridade, probabilidades)"""
+        return self.classificar_lote([texto])[0]
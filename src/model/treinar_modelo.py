@@ -1,12 +1,18 @@
+import argparse
+import time
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer, TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
+from sklearn.pipeline import Pipeline
 import pickle
 import os
 from pathlib import Path
+from .motor_inferencia import InferenceEngine
+from .artefato_modelo import salvar_artefato, verificar_artefato
+from .pontuador_compilado import PontuadorCompilado
 
 # Obter o diretório raiz do projeto
 PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
@@ -17,53 +23,173 @@ MODEL_DIR = Path(__file__).parent.absolute()
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-def treinar_modelo():
-    # Carregar o dataset
-    print("Carregando dataset...")
+# Colunas do espaço de hashing (variante sem vocabulário)
+N_FEATURES_HASHING = 2 ** 18
+
+def criar_vectorizer(hashing=False, n_features=N_FEATURES_HASHING, usar_idf=True):
+    """
+    TfidfVectorizer com vocabulário ou, com `hashing`, um pipeline sem vocabulário.
+
+    O HashingVectorizer não precisa de ajuste (a coluna de cada termo é o seu
+    hash), então só o IDF opcional, guardado como array denso, é aprendido.
+    """
+    if not hashing:
+        return TfidfVectorizer(max_features=5000)
+    etapas = [('hashing', HashingVectorizer(n_features=n_features, alternate_sign=False,
+                                             norm=None if usar_idf else 'l2'))]
+    if usar_idf:
+        etapas.append(('tfidf', TfidfTransformer()))
+    return Pipeline(etapas)
+
+def agrupar_duplicatas(df):
+    """Agrupa as linhas (texto, prioridade) idênticas, com a quantidade de cada uma na coluna 'peso'"""
+    return df.groupby(['texto', 'prioridade'], sort=False).size().reset_index(name='peso')
+
+def dividir_por_texto(unicos, test_size=0.3, random_state=42):
+    """Divide em treino e teste por texto: todas as repetições de um texto ficam do mesmo lado"""
+    textos = unicos['texto'].unique()
+    treino, _ = train_test_split(textos, test_size=test_size, random_state=random_state)
+    no_treino = unicos['texto'].isin(set(treino))
+    return unicos[no_treino], unicos[~no_treino]
+
+def calcular_idf(documentos, n_documentos, smooth_idf=True):
+    """IDF do scikit-learn a partir da quantidade de documentos com cada termo"""
+    return np.log((n_documentos + int(smooth_idf)) / (np.asarray(documentos, dtype=np.float64) + int(smooth_idf))) + 1
+
+def idf_ponderado(contagens, pesos, smooth_idf=True):
+    """IDF do scikit-learn calculado como se cada linha de `contagens` se repetisse `pesos` vezes"""
+    pesos = np.asarray(pesos, dtype=np.float64)
+    return calcular_idf((contagens > 0).astype(np.float64).T @ pesos, pesos.sum(), smooth_idf)
+
+def cortar_vocabulario(frequencias, limite):
+    """Colunas dos `limite` termos mais frequentes, em ordem alfabética (mesmo critério de `max_features`)"""
+    frequencias = np.rint(np.asarray(frequencias, dtype=np.float64)).astype(np.int64)
+    return np.sort((-frequencias).argsort()[:limite])
+
+def ajustar_vectorizer(vectorizer, textos, pesos):
+    """
+    Ajusta o vectorizer como se cada texto aparecesse `pesos` vezes e retorna a matriz dos textos.
+
+    O ajuste do scikit-learn não aceita `sample_weight`: o corte de
+    `max_features` e o IDF, as únicas partes que dependem das repetições, são
+    refeitos com as contagens ponderadas e as mesmas fórmulas.
+    """
+    passos = dict(getattr(vectorizer, 'steps', []))
+    if passos:
+        # HashingVectorizer não tem ajuste; só o TfidfTransformer opcional aprende o IDF
+        transformador = passos.get('tfidf')
+        if transformador is None:
+            return vectorizer.transform(textos)
+        contagens = passos['hashing'].transform(textos)
+        transformador.fit(contagens)
+        transformador.idf_ = idf_ponderado(contagens, pesos, transformador.smooth_idf)
+        return transformador.transform(contagens)
+
+    params = vectorizer.get_params()
+    if params['min_df'] != 1 or params['max_df'] != 1.0:
+        raise ValueError("Ajuste ponderado não suporta min_df/max_df")
+    contador = CountVectorizer(**{chave: valor for chave, valor in params.items() if chave in CountVectorizer().get_params()})
+    contador.set_params(max_features=None)
+    contagens = contador.fit_transform(textos)
+    limite = params['max_features']
+    if limite is not None and contagens.shape[1] > limite:
+        colunas = cortar_vocabulario(contagens.T @ np.asarray(pesos, dtype=np.float64), limite)
+        termos = contador.get_feature_names_out()[colunas]
+        vectorizer.set_params(vocabulary={termo: coluna for coluna, termo in enumerate(termos)})
+        contagens = contagens[:, colunas]
+    vectorizer.fit(textos)
+    if params['use_idf']:
+        vectorizer.idf_ = idf_ponderado(contagens, pesos, params['smooth_idf'])
+    return vectorizer.transform(textos)
+
+def localizar_dataset(dataset_path=None):
+    """Caminho do dataset informado ou do sintético, gerado se ainda não existir"""
+    if dataset_path is not None:
+        return dataset_path
     dataset_path = DATA_DIR / "dataset_tickets_prioridade.csv"
-    
     if not os.path.exists(dataset_path):
         print(f"Dataset não encontrado em {dataset_path}. Gerando dados sintéticos...")
         from . import gerador_dados_sinteticos
         dataset_path = gerador_dados_sinteticos.main()
-    
-    df = pd.read_csv(dataset_path, encoding='utf-8')
+    return dataset_path
+
+def treinar_modelo(hashing=False, n_features=N_FEATURES_HASHING, usar_idf=True, deduplicar=True, dataset_path=None):
+    # Carregar o dataset
+    print("Carregando dataset...")
+    df = pd.read_csv(localizar_dataset(dataset_path), encoding='utf-8')
 
-    # Dividir em treino e teste
-    X_train, X_test, y_train, y_test = train_test_split(
-        df['texto'], df['prioridade'], test_size=0.3, random_state=42
-    )
+    # Linhas repetidas viram uma linha com peso; a divisão é por texto, sem repetições
+    # do mesmo ticket no treino e no teste
+    unicos = agrupar_duplicatas(df)
+    print(f"{len(df)} linhas, {len(unicos)} únicas")
+    treino, teste = dividir_por_texto(unicos)
+    if not deduplicar:
+        treino = treino.loc[treino.index.repeat(treino['peso'])].assign(peso=1)
+        teste = teste.loc[teste.index.repeat(teste['peso'])].assign(peso=1)
+    X_train, y_train, w_train = treino['texto'], treino['prioridade'], treino['peso'].to_numpy()
+    X_test, y_test, w_test = teste['texto'], teste['prioridade'], teste['peso'].to_numpy()
 
     # Vetorizar texto
-    print("Preparando textos...")
-    vectorizer = TfidfVectorizer(max_features=5000)
-    X_train_vec = vectorizer.fit_transform(X_train)
+    print("Preparando textos..." + (f" (hashing com {n_features} colunas)" if hashing else ""))
+    inicio = time.perf_counter()
+    vectorizer = criar_vectorizer(hashing, n_features, usar_idf)
+    if deduplicar:
+        X_train_vec = ajustar_vectorizer(vectorizer, X_train, w_train)
+    else:
+        X_train_vec = vectorizer.fit_transform(X_train)
     X_test_vec = vectorizer.transform(X_test)
+    print(f"Vetorização: {time.perf_counter() - inicio:.2f}s")
 
-    # Treinar modelo
+    # Treinar modelo (o peso de cada linha é o número de repetições)
     print("Treinando modelo...")
+    inicio = time.perf_counter()
     model = LogisticRegression(max_iter=1000, random_state=42)
-    model.fit(X_train_vec, y_train)
+    model.fit(X_train_vec, y_train, sample_weight=w_train)
+    print(f"Ajuste: {time.perf_counter() - inicio:.2f}s")
 
-    # Avaliar modelo
+    # Avaliar modelo, ponderando pelas repetições como no dataset original
     print("Avaliando modelo...")
     y_pred = model.predict(X_test_vec)
-    accuracy = accuracy_score(y_test, y_pred)
-    report = classification_report(y_test, y_pred)
+    accuracy = accuracy_score(y_test, y_pred, sample_weight=w_test)
+    report = classification_report(y_test, y_pred, sample_weight=w_test)
 
     print(f"Acurácia: {accuracy:.4f}")
     print("\nRelatório de classificação:")
     print(report)
 
-    # Salvar modelo e vectorizer
+    salvar_modelo(model, vectorizer, X_test.tolist())
+    return model, vectorizer
+
+def salvar_modelo(model, vectorizer, textos_validacao):
+    """Salva o pickle (model, vectorizer) e o artefato do pontuador compilado"""
     print("Salvando modelo...")
     modelo_path = MODEL_DIR / "modelo_classificacao.pkl"
-    with open(modelo_path, 'wb') as f:
+    # Grava em um temporário e renomeia, para que uma API em execução nunca leia o arquivo pela metade
+    temporario = modelo_path.with_suffix('.pkl.tmp')
+    with open(temporario, 'wb') as f:
         pickle.dump((model, vectorizer), f)
+    os.replace(temporario, modelo_path)
 
     print(f"Modelo salvo como '{modelo_path}'")
-    
-    return model, vectorizer
+
+    # Exportar o pontuador compilado como artefato mapeável, conferindo-o contra o scikit-learn
+    exportar_pontuador_compilado(model, vectorizer, textos_validacao)
+
+def exportar_pontuador_compilado(model, vectorizer, textos_validacao):
+    """Exporta o pontuador compilado como artefato versionado ao lado do modelo"""
+    try:
+        pontuador = PontuadorCompilado.a_partir_do_sklearn(model, vectorizer)
+        diferenca = pontuador.conferir(model, vectorizer, textos_validacao)
+    except ValueError as e:
+        print(f"Pontuador compilado não exportado: {e}")
+        return None
+
+    artefato_path = MODEL_DIR / "modelo_artefato"
+    manifesto = salvar_artefato(pontuador, artefato_path)
+    verificar_artefato(artefato_path, manifesto)
+    print(f"Artefato do modelo salvo em '{artefato_path}' (versão {manifesto['versao_modelo'][:12]}, "
+          f"diferença máxima: {diferenca:.2e})")
+    return artefato_path
 
 def testar_exemplos(model, vectorizer):
     # Exemplo de uso
@@ -77,19 +203,36 @@ def testar_exemplos(model, vectorizer):
         "Sistema deu erro"
     ]
 
-    # Vetorizar exemplos
-    exemplos_vec = vectorizer.transform(exemplos)
-    predicoes = model.predict(exemplos_vec)
-    probabilidades = model.predict_proba(exemplos_vec)
-
-    for i, exemplo in enumerate(exemplos):
+    # Classificar exemplos com o mesmo motor usado pela API
+    engine = InferenceEngine(model, vectorizer)
+    for exemplo, (predicao, probs) in zip(exemplos, engine.classificar_lote(exemplos)):
         print(f"\nTexto: {exemplo}")
-        print(f"Classificação: {predicoes[i]}")
-        probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades[i])}
+        print(f"Classificação: {predicao}")
         print(f"Probabilidades: {probs}")
         
-def main():
-    model, vectorizer = treinar_modelo()
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py train', description="Treina o modelo de classificação")
+    parser.add_argument('--hashing', action='store_true',
+                        help="Usa HashingVectorizer (sem vocabulário) em vez do TfidfVectorizer")
+    parser.add_argument('--n-features', type=int, default=N_FEATURES_HASHING,
+                        help=f"Colunas do espaço de hashing (padrão: {N_FEATURES_HASHING})")
+    parser.add_argument('--sem-idf', action='store_true', help="Com --hashing, não aplica a ponderação IDF")
+    parser.add_argument('--sem-deduplicar', action='store_true',
+                        help="Treina com as linhas repetidas em vez de uma linha única com peso")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Lê o dataset em blocos e treina em mini-lotes, com memória limitada")
+    parser.add_argument('--dataset', help="CSV com as colunas texto e prioridade (padrão: o dataset sintético)")
+    parser.add_argument('--tamanho-bloco', type=int, default=10000, help="Com --streaming, linhas por bloco")
+    parser.add_argument('--epocas', type=int, default=5, help="Com --streaming, passadas de treino pelo dataset")
+    args = parser.parse_args(argv)
+
+    if args.streaming:
+        from .treinar_streaming import treinar_modelo_streaming
+        model, vectorizer = treinar_modelo_streaming(args.dataset, args.hashing, args.n_features, not args.sem_idf,
+                                                     args.tamanho_bloco, args.epocas)
+    else:
+        model, vectorizer = treinar_modelo(args.hashing, args.n_features, not args.sem_idf, not args.sem_deduplicar,
+                                           args.dataset)
     testar_exemplos(model, vectorizer)
     return model, vectorizer
 
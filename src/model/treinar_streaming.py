@@ -0,0 +1,185 @@
+"""
+Treinamento out-of-core, para históricos de tickets maiores que a memória.
+
+O CSV é lido em blocos de `tamanho_bloco` linhas e nunca fica inteiro em
+memória. As repetições de cada bloco viram uma linha com peso.
+
+1. Uma primeira passada encontra as classes e, para o TF-IDF, o vocabulário
+   e a frequência de documentos de cada termo (com hashing, um array de
+   tamanho fixo).
+2. Cada época treina um `SGDClassifier` de perda logística com
+   `partial_fit`, um bloco de cada vez.
+3. Uma última passada avalia o modelo nas linhas de teste.
+
+A divisão entre treino e teste é feita pelo hash do texto, então todas as
+repetições de um ticket ficam do mesmo lado sem guardar nada por linha. A
+memória depende do tamanho do bloco e do vocabulário, não do número de
+linhas; com hashing, nem do vocabulário.
+"""
+import re
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn import __version__ as VERSAO_SKLEARN
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import confusion_matrix
+
+from src.utils.memoria import pico_memoria_residente
+
+from .treinar_modelo import (N_FEATURES_HASHING, agrupar_duplicatas, calcular_idf, cortar_vocabulario,
+                             criar_vectorizer, localizar_dataset, salvar_modelo)
+
+# Fração dos textos (pelo hash) reservada para teste
+FRACAO_TESTE = 0.3
+# Textos de teste guardados para conferir o pontuador compilado
+MAX_TEXTOS_VALIDACAO = 1000
+# Nome da perda logística do SGDClassifier: 'log_loss' a partir do scikit-learn 1.1, 'log' antes
+PERDA_LOGISTICA = 'log_loss' if tuple(map(int, re.match(r'(\d+)\.(\d+)', VERSAO_SKLEARN).groups())) >= (1, 1) else 'log'
+
+
+def pico_memoria_mb():
+    """Pico de memória residente do processo, em MB (NaN se indisponível)"""
+    pico = pico_memoria_residente()
+    return pico / 2 ** 20 if pico is not None else float('nan')
+
+
+def no_teste(textos, fracao=FRACAO_TESTE):
+    """Máscara dos textos de teste, decidida pelo CRC32 do texto (estável entre passadas e execuções)"""
+    limite = int(fracao * 2 ** 32)
+    return np.fromiter((zlib.crc32(texto.encode('utf-8')) < limite for texto in textos),
+                       dtype=bool, count=len(textos))
+
+
+def ler_blocos(caminho, tamanho_bloco, teste=False):
+    """Gera (textos, prioridades, pesos, linhas lidas) de cada bloco do CSV, só com as linhas de treino ou de teste"""
+    for bloco in pd.read_csv(caminho, usecols=['texto', 'prioridade'], dtype=str, encoding='utf-8',
+                             chunksize=tamanho_bloco):
+        lidas = len(bloco)
+        bloco = bloco.dropna()
+        unicos = agrupar_duplicatas(bloco[no_teste(bloco['texto'].tolist()) == teste])
+        yield (unicos['texto'].tolist(), unicos['prioridade'].to_numpy(),
+               unicos['peso'].to_numpy(dtype=np.float64), lidas)
+
+
+def percorrer(descricao, blocos, processar):
+    """Aplica `processar(textos, prioridades, pesos)` a cada bloco e imprime a vazão e o pico de memória"""
+    inicio = time.perf_counter()
+    linhas = 0
+    for textos, prioridades, pesos, lidas in blocos:
+        linhas += lidas
+        if textos:
+            processar(textos, prioridades, pesos)
+    duracao = time.perf_counter() - inicio
+    print(f"{descricao}: {linhas} linhas em {duracao:.1f}s ({linhas / max(duracao, 1e-9):,.0f} linhas/s), "
+          f"pico de memória {pico_memoria_mb():.0f}MB")
+
+
+def ajustar_vocabulario(vectorizer, caminho, tamanho_bloco, hashing, usar_idf):
+    """
+    Primeira passada: ajusta o vectorizer com as contagens acumuladas bloco a bloco.
+
+    Retorna as classes encontradas. O resultado é o mesmo de ajustar o
+    vectorizer no conjunto de treino inteiro.
+    """
+    classes = set()
+    n_documentos = 0.0
+    if hashing:
+        contador = vectorizer.named_steps['hashing']
+        documentos = np.zeros(contador.n_features) if usar_idf else None
+    else:
+        params = vectorizer.get_params()
+        contador = CountVectorizer(**{chave: valor for chave, valor in params.items()
+                                      if chave in CountVectorizer().get_params()})
+        contador.set_params(max_features=None)
+        documentos = defaultdict(float)
+        frequencias = defaultdict(float)
+
+    def contar(textos, prioridades, pesos):
+        nonlocal n_documentos
+        classes.update(prioridades.tolist())
+        n_documentos += pesos.sum()
+        if hashing:
+            if documentos is not None:
+                documentos[:] += (contador.transform(textos) > 0).astype(np.float64).T @ pesos
+            return
+        try:
+            contagens = contador.fit_transform(textos)
+        except ValueError:
+            # Bloco sem nenhum termo (só textos vazios ou de pontuação)
+            return
+        for termo, n_docs, n_termo in zip(contador.get_feature_names_out().tolist(),
+                                          (contagens > 0).astype(np.float64).T @ pesos, contagens.T @ pesos):
+            documentos[termo] += n_docs
+            frequencias[termo] += n_termo
+
+    percorrer("Vocabulário", ler_blocos(caminho, tamanho_bloco), contar)
+
+    if hashing:
+        if documentos is not None:
+            transformador = vectorizer.named_steps['tfidf']
+            transformador.fit(sparse.csr_matrix((1, contador.n_features)))
+            transformador.idf_ = calcular_idf(documentos, n_documentos, transformador.smooth_idf)
+        return sorted(classes)
+
+    termos = sorted(documentos)
+    if not termos:
+        raise ValueError("Nenhum termo encontrado no dataset de treino")
+    limite = params['max_features']
+    colunas = cortar_vocabulario([frequencias[termo] for termo in termos], limite) \
+        if limite is not None and len(termos) > limite else range(len(termos))
+    termos = [termos[coluna] for coluna in colunas]
+    vectorizer.set_params(vocabulary={termo: coluna for coluna, termo in enumerate(termos)})
+    vectorizer.fit([''])
+    if params['use_idf']:
+        vectorizer.idf_ = calcular_idf([documentos[termo] for termo in termos], n_documentos, params['smooth_idf'])
+    print(f"Vocabulário: {len(termos)} termos")
+    return sorted(classes)
+
+
+def treinar_modelo_streaming(dataset_path=None, hashing=False, n_features=N_FEATURES_HASHING, usar_idf=True,
+                             tamanho_bloco=10000, epocas=5, alpha=1e-5, random_state=42):
+    """Treina lendo o dataset em blocos; retorna (model, vectorizer) já salvos como o treinamento em memória"""
+    caminho = localizar_dataset(dataset_path)
+    print(f"Treinamento em blocos de {tamanho_bloco} linhas a partir de '{caminho}'"
+          + (f" (hashing com {n_features} colunas)" if hashing else ""))
+    inicio = time.perf_counter()
+
+    vectorizer = criar_vectorizer(hashing, n_features, usar_idf)
+    classes = np.array(ajustar_vocabulario(vectorizer, caminho, tamanho_bloco, hashing, usar_idf))
+    print(f"Classes: {', '.join(classes)}")
+
+    model = SGDClassifier(loss=PERDA_LOGISTICA, alpha=alpha, random_state=random_state)
+    aleatorio = np.random.default_rng(random_state)
+
+    def treinar(textos, prioridades, pesos):
+        # Blocos em ordem de arquivo; dentro de cada um, os exemplos são embaralhados
+        ordem = aleatorio.permutation(len(textos))
+        model.partial_fit(vectorizer.transform([textos[i] for i in ordem]), prioridades[ordem],
+                          classes=classes, sample_weight=pesos[ordem])
+
+    for epoca in range(epocas):
+        percorrer(f"Época {epoca + 1}/{epocas}", ler_blocos(caminho, tamanho_bloco), treinar)
+
+    confusao = np.zeros((len(classes), len(classes)))
+    validacao = []
+
+    def avaliar(textos, prioridades, pesos):
+        confusao[:] += confusion_matrix(prioridades, model.predict(vectorizer.transform(textos)),
+                                        labels=classes, sample_weight=pesos)
+        validacao.extend(textos[:MAX_TEXTOS_VALIDACAO - len(validacao)])
+
+    percorrer("Avaliação", ler_blocos(caminho, tamanho_bloco, teste=True), avaliar)
+    if confusao.sum():
+        print(f"Acurácia: {np.trace(confusao) / confusao.sum():.4f}")
+        print("\nMatriz de confusão (linhas: real, colunas: prevista):")
+        print(pd.DataFrame(confusao.astype(np.int64), index=classes, columns=classes))
+
+    salvar_modelo(model, vectorizer, validacao)
+    print(f"\nTreinamento concluído em {time.perf_counter() - inicio:.1f}s; "
+          f"pico de memória do processo: {pico_memoria_mb():.0f}MB")
+    return model, vectorizer
@@ -0,0 +1,26 @@
+"""
+Memória residente do processo, usada pelas métricas da API, pelo treinamento e pelos benchmarks.
+"""
+import os
+
+
+def memoria_residente():
+    """Memória residente (RSS) do processo em bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    # Sem /proc, usa o pico de RSS
+    return pico_memoria_residente()
+
+
+def pico_memoria_residente():
+    """Pico de memória residente do processo em bytes (None se indisponível)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if os.uname().sysname == 'Darwin' else pico * 1024
@@ -1,13 +1,12 @@
-import pickle
 import pandas as pd
+from src.model.motor_inferencia import InferenceEngine
 
 def main():
     print("Teste Avançado de Casos Específicos")
     print("=" * 70)
     
     # Carregar modelo
-    with open('src/model/modelo_classificacao.pkl', 'rb') as f:
-        modelo, vectorizer = pickle.load(f)
+    engine = InferenceEngine.carregar('src/model/modelo_classificacao.pkl')
     
     # Casos específicos para testar
     casos_teste = [
@@ -34,13 +33,8 @@ def main():
     print("{:<45} {:<10} {:<25}".format("TEXTO", "RESULTADO", "PROBABILIDADES"))
     print("-" * 80)
     
-    for texto in casos_teste:
-        texto_vec = vectorizer.transform([texto])
-        prioridade = modelo.predict(texto_vec)[0]
-        probabilidades = modelo.predict_proba(texto_vec)[0]
-        
-        # Formatar probabilidades e ordenar
-        probs = {classe: float(prob) for classe, prob in zip(modelo.classes_, probabilidades)}
+    for texto, (prioridade, probs) in zip(casos_teste, engine.classificar_lote(casos_teste)):
+        # Ordenar probabilidades
         sorted_probs = sorted(probs.items(), key=lambda x: x[1], reverse=True)
         
         # Truncar texto para ajustar na saída
@@ -1,14 +1,13 @@
-import pickle
 import pandas as pd
 import sys
 from pathlib import Path
+from src.model.motor_inferencia import InferenceEngine
 
 print("Teste de classificação: componentes críticos com problemas estéticos")
 print("=" * 70)
 
 # Carregar modelo
-with open('src/model/modelo_classificacao.pkl', 'rb') as f:
-    model, vectorizer = pickle.load(f)
+engine = InferenceEngine.carregar('src/model/modelo_classificacao.pkl')
 
 # Casos de teste específicos
 casos_teste = [
@@ -41,13 +40,8 @@ casos_teste = [
 print("{:<35} {:<10} {:<20}".format("TEXTO", "RESULTADO", "PROBABILIDADES"))
 print("-" * 70)
 
-for texto in casos_teste:
-    texto_vec = vectorizer.transform([texto])
-    prioridade = model.predict(texto_vec)[0]
-    probabilidades = model.predict_proba(texto_vec)[0]
-    
+for texto, (prioridade, probs) in zip(casos_teste, engine.classificar_lote(casos_teste)):
     # Formatar probabilidades para melhor visualização
-    probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades)}
     sorted_probs = dict(sorted(probs.items(), key=lambda item: item[1], reverse=True))
     
     # Verificar se o resultado é o esperado
@@ -77,12 +71,7 @@ print("\nCaso específico que falhou anteriormente:")
 print("-" * 70)
 
 texto = "A tela de login é feia"
-texto_vec = vectorizer.transform([texto])
-prioridade = model.predict(texto_vec)[0]
-probabilidades = model.predict_proba(texto_vec)[0]
-
-# Criar um dicionário de probabilidades
-probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades)}
+prioridade, probs = engine.classificar(texto)
 print(f"Texto: \"{texto}\"")
 print(f"Classificação: {prioridade.upper()}")
 print("Probabilidades:")
@@ -1,10 +1,9 @@
-import pickle
 import sys
 from pathlib import Path
+from src.model.motor_inferencia import InferenceEngine
 
 # Carregar modelo
-with open('src/model/modelo_classificacao.pkl', 'rb') as f:
-    model, vectorizer = pickle.load(f)
+engine = InferenceEngine.carregar('src/model/modelo_classificacao.pkl')
 
 # Testar frases específicas
 frases = [
@@ -44,13 +43,8 @@ frases = [
 print("Resultados da classificação:")
 print("=" * 80)
 
-for frase in frases:
-    frase_vec = vectorizer.transform([frase])
-    prioridade = model.predict(frase_vec)[0]
-    probabilidades = model.predict_proba(frase_vec)[0]
-    
+for frase, (prioridade, probs) in zip(frases, engine.classificar_lote(frases)):
     # Ordenar probabilidades para melhor visualização
-    probs = {classe: float(prob) for classe, prob in zip(model.classes_, probabilidades)}
     sorted_probs = dict(sorted(probs.items(), key=lambda item: item[1], reverse=True))
     
     # Formatar a saída